@@ -0,0 +1,134 @@
+# activations.py
+#
+# Description : Activation functions, registered by name, with vectorized versions for numpy arrays.
+# --------------------------------------------------------------------------------------------------
+
+# General imports
+from math import exp, tanh
+from typing import Callable, Dict, Union
+
+# Constants
+# exp overflows above ~709.8, beyond this limit a sigmoid is 0 to double precision.
+EXP_LIMIT = 700.0
+
+# Maximum absolute difference between hard_sigmoid and sigmoid, reached around x = +-1.32.
+HARD_SIGMOID_ERROR = 0.0692
+
+
+# NEAT paper activation function
+def neat_sigmoid(x: float) -> float:
+    z = -4.9 * x
+    return 1.0 / (1.0 + exp(z)) if z < EXP_LIMIT else 0.0
+
+
+# Default activation function
+def sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + exp(-x)) if x > -EXP_LIMIT else 0.0
+
+
+# Clamped linear approximation of sigmoid, within HARD_SIGMOID_ERROR of it, without calling exp.
+def hard_sigmoid(x: float) -> float:
+    x = x / 6.0 + 0.5
+    return 0.0 if x < 0.0 else 1.0 if x > 1.0 else x
+
+
+def relu(x: float) -> float:
+    return x if x > 0.0 else 0.0
+
+
+# Input node activation function
+def identity(x: float) -> float:
+    return x
+
+
+# Activation functions by name, their names by function, and their vectorized versions by function.
+ACTIVATIONS: Dict[str, Callable[[float], float]] = {
+    'neat_sigmoid': neat_sigmoid,
+    'sigmoid': sigmoid,
+    'hard_sigmoid': hard_sigmoid,
+    'tanh': tanh,
+    'relu': relu,
+    'identity': identity,
+}
+ACTIVATION_NAMES: Dict[Callable[[float], float], str] = {activation: name for name, activation in ACTIVATIONS.items()}
+VECTORIZED: Dict[Callable[[float], float], Callable] = {}
+
+
+def register_activation(name: str, activation: Callable[[float], float],
+                        vectorized_activation: Union[Callable, None] = None) -> None:
+    """
+    Registers an activation function. It should be defined at module level, so networks using it can be pickled.
+    :param name: Activation name
+    :param activation: Activation function of a float
+    :param vectorized_activation: Elementwise version of the activation function for numpy arrays, if not set the
+                                  activation function is vectorized by numpy (slowly)
+    :return: None
+    """
+    ACTIVATIONS[name] = activation
+    ACTIVATION_NAMES[activation] = name
+    if vectorized_activation is not None:
+        VECTORIZED[activation] = vectorized_activation
+
+
+def get_activation(name: str) -> Callable[[float], float]:
+    """
+    Finds an activation function by its name.
+    :param name: Activation name
+    :return: Activation function
+    """
+    activation = ACTIVATIONS.get(name)
+    if activation is None:
+        raise ValueError('Unknown activation {}, registered activations are {}.'.format(name, ', '.join(ACTIVATIONS)))
+    return activation
+
+
+def load_vectorized() -> None:
+    """
+    Registers the vectorized versions of the built-in activation functions. Numpy is only imported here, so scalar
+    evaluation never needs it.
+    :return: None
+    """
+    import numpy as np
+
+    def vectorized_neat_sigmoid(x):
+        return 1.0 / (1.0 + np.exp(-4.9 * x))
+
+    def vectorized_sigmoid(x):
+        return 1.0 / (1.0 + np.exp(-x))
+
+    def vectorized_hard_sigmoid(x):
+        return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+    def vectorized_relu(x):
+        return np.maximum(x, 0.0)
+
+    VECTORIZED.setdefault(neat_sigmoid, vectorized_neat_sigmoid)
+    VECTORIZED.setdefault(sigmoid, vectorized_sigmoid)
+    VECTORIZED.setdefault(hard_sigmoid, vectorized_hard_sigmoid)
+    VECTORIZED.setdefault(tanh, np.tanh)
+    VECTORIZED.setdefault(relu, vectorized_relu)
+    VECTORIZED.setdefault(identity, identity)
+
+
+def vectorized(activation: Callable[[float], float]) -> Callable:
+    """
+    Returns the elementwise version of an activation function, for numpy arrays.
+    :param activation: Activation function
+    :return: Vectorized activation function
+    """
+    if identity not in VECTORIZED:
+        load_vectorized()
+    vectorized_activation = VECTORIZED.get(activation)
+    if vectorized_activation is None:
+        import numpy as np
+        vectorized_activation = VECTORIZED[activation] = np.vectorize(activation, otypes=[float])
+    return vectorized_activation
+
+
+if __name__ == '__main__':
+    import numpy
+
+    print('Testing activations')
+    values_test = numpy.linspace(-8.0, 8.0, 5)
+    for name_test, activation_test in ACTIVATIONS.items():
+        print(name_test, [activation_test(value) for value in values_test], vectorized(activation_test)(values_test))
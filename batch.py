@@ -0,0 +1,183 @@
+# batch.py
+#
+# Description : Vectorized evaluation of a compiled plan over many input vectors.
+# -------------------------------------------------------------------------------
+
+# General imports
+from typing import List, Union
+
+import numpy as np
+
+# Project imports
+from activations import identity, vectorized
+from plan import Plan
+
+
+def plan_layers(plan: Plan) -> List[tuple]:
+    """
+    Splits a plan into its layers, for vectorized evaluation.
+    :param plan: Compiled plan
+    :return: For every layer: its start and end positions, the source positions, destination offsets in the layer and
+             indexes of the connections leading into it, and its nodes grouped by activation (see activate)
+    """
+    src = np.array(plan.src, dtype=np.intp)
+    dst = np.array(plan.dst, dtype=np.intp)
+    layers = []
+    start = 0
+    for end in plan.layer_ends:
+        edges = np.flatnonzero((dst >= start) & (dst < end))
+        groups = {}
+        for offset, activation in enumerate(plan.activations[start:end]):
+            groups.setdefault(activation, []).append(offset)
+
+        # A layer with a single activation is activated as a whole. The input layer's identity is skipped.
+        groups = [(vectorized(activation), slice(None) if len(offsets) == end - start else np.array(offsets))
+                  for activation, offsets in groups.items() if start or activation is not identity]
+        layers.append((start, end, src[edges], dst[edges] - start, edges, groups))
+        start = end
+    return layers
+
+
+def activate(layer_values: np.ndarray, total: np.ndarray, groups: List[tuple]) -> None:
+    """
+    Activates the nodes of a layer, in place.
+    :param layer_values: Node values of the layer, with the nodes on the last axis
+    :param total: Summed inputs of the layer's nodes, shaped like layer_values
+    :param groups: Vectorized activations, and the offsets in the layer of the nodes they activate
+    :return: None
+    """
+    for activation, offsets in groups:
+        layer_values[..., offsets] = activation(total[..., offsets])
+
+
+class CsrEdges:
+
+    def __init__(self, src: np.ndarray, dst: np.ndarray, edges: np.ndarray):
+        """
+        Connections grouped by destination, compressed sparse row form with a row per receiving node.
+        :param src: Source position of every connection
+        :param dst: Destination of every connection (position, or offset in its layer)
+        :param edges: Index of every connection in the plan's weights
+        """
+        order = np.argsort(dst, kind='stable')
+        self.src = src[order]
+        self.edges = edges[order]
+        self.rows, self.starts = np.unique(dst[order], return_index=True)
+        self.weight = None
+
+    def load_weights(self, weight: np.ndarray) -> None:
+        self.weight = weight[self.edges]
+
+    def product(self, values: np.ndarray) -> np.ndarray:
+        """
+        Sums the weighted values sent to every receiving node.
+        :param values: Node values, shaped (samples, nodes)
+        :return: Summed inputs of the receiving nodes (see rows), shaped (samples, rows)
+        """
+        return np.add.reduceat(values[:, self.src] * self.weight, self.starts, axis=1)
+
+
+class BatchPlan:
+
+    def __init__(self, plan: Plan):
+        """
+        Evaluates a plan for many input vectors at once, with a dense weight matrix per layer. The outputs agree with
+        Plan.get_output up to float rounding, not bit for bit: the matrix product sums each node's inputs in its own
+        order, so outputs can differ by a few units in the last place. Compare them with np.allclose.
+        :param plan: Compiled plan
+        """
+        self.plan = plan
+        self.layers = plan_layers(plan)
+        self.bias = np.array(plan.bias, dtype=np.float64)
+
+        # Recurrent connections are gathered from the previous step's values, and summed into their destinations.
+        self.recurrent = None
+        if plan.recurrent_src:
+            self.recurrent = CsrEdges(np.array(plan.recurrent_src, dtype=np.intp),
+                                      np.array(plan.recurrent_dst, dtype=np.intp),
+                                      np.arange(len(plan.recurrent_src)))
+
+        self.weight = None
+        self.matrices = []
+        self.load_weights()
+
+    def load_weights(self) -> None:
+        """
+        Builds the weight matrix of every layer from the plan's weights.
+        :return: None
+        """
+        self.weight = self.plan.weight
+        weight = np.array(self.weight, dtype=np.float64)
+        self.matrices = []
+        for start, end, src, dst, edges, _ in self.layers:
+            matrix = np.zeros((start, end - start))
+            np.add.at(matrix, (src, dst), weight[edges])
+            self.matrices.append(matrix)
+        if self.recurrent is not None:
+            self.recurrent.load_weights(np.array(self.plan.recurrent_weight, dtype=np.float64))
+
+    def get_outputs(self, inputs) -> np.ndarray:
+        """
+        Calculates the network output for every row of inputs.
+        :param inputs: Network inputs, shaped (samples, inputs)
+        :return: Network outputs, shaped (samples, outputs)
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        values = np.repeat(self.bias[None, :], inputs.shape[0], axis=0)
+        values[:, self.plan.input_positions] = inputs
+        self.propagate(values)
+        return values[:, self.plan.output_positions]
+
+    def step(self, inputs, state: np.ndarray, values: Union[np.ndarray, None] = None) -> tuple:
+        """
+        Calculates the network output of a single time step for every row of inputs, each row being a separate
+        environment. Recurrent connections carry the node values of the previous step, at a cost proportional to
+        their number.
+        :param inputs: Network inputs, shaped (environments, inputs)
+        :param state: Node values of the previous step, shaped (environments, nodes)
+        :param values: Array the node values of this step are written to, shaped like state and distinct from it, so
+                       steps can alternate between two arrays. A new array is allocated if not set
+        :return: Network outputs shaped (environments, outputs), node values of this step
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if self.weight is not self.plan.weight:
+            self.load_weights()
+        if values is None:
+            values = np.empty_like(state)
+        values[:] = self.bias
+        if self.recurrent is not None:
+            values[:, self.recurrent.rows] += self.recurrent.product(state)
+        values[:, self.plan.input_positions] += inputs
+        self.propagate(values)
+        return values[:, self.plan.output_positions], values
+
+    def propagate(self, values: np.ndarray) -> None:
+        """
+        Activates every layer and sends its output to the later layers, in place.
+        :param values: Summed inputs of every node shaped (samples, nodes), replaced by the node outputs
+        :return: None
+        """
+
+        # The plan's weights are replaced (not modified) when the network's weights are mutated.
+        if self.weight is not self.plan.weight:
+            self.load_weights()
+
+        # Each layer only receives from earlier layers, so it is one matrix product and activation.
+        with np.errstate(over='ignore'):
+            for (start, end, _, _, _, groups), matrix in zip(self.layers, self.matrices):
+                total = values[:, start:end]
+                if start:
+                    total = total + values[:, :start] @ matrix
+                activate(values[:, start:end], total, groups)
+
+
+if __name__ == '__main__':
+    from network import Network
+
+    print('Testing BatchPlan')
+    network_test = Network(2, 1, 2)
+    batch_test = BatchPlan(network_test.compile())
+    test_inputs = np.array([[-1, 0.5], [0, 0], [1, 1]])
+    scalar_test = [network_test.get_output(row) for row in test_inputs.tolist()]
+    print(batch_test.get_outputs(test_inputs))
+    print(scalar_test, np.allclose(batch_test.get_outputs(test_inputs), scalar_test))
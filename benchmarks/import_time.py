@@ -0,0 +1,62 @@
+# import_time.py
+#
+# Description : Cold start benchmark, guards the import time of the evaluation modules.
+# --------------------------------------------------------------------------------------
+
+# General imports
+import os
+import subprocess
+import sys
+from statistics import median
+
+# Constants
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('network', 'parallel', 'export')
+HEAVY_MODULES = ('graphviz', 'numpy')
+REPEATS = 15
+
+# Budget of each module's median cold import time, in milliseconds.
+BUDGET = 150.0
+
+# Imports a module in a fresh interpreter, prints its import time and the heavy modules it pulled in.
+SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000.0)
+print(' '.join(name for name in {heavy} if name in sys.modules))
+'''
+
+
+def import_time(module: str) -> tuple:
+    """
+    Measures the cold import time of a module, each import in a new interpreter.
+    :param module: Module name
+    :return: Median import time in milliseconds, heavy modules imported
+    """
+    times, heavy = [], ''
+    for _ in range(REPEATS):
+        output = subprocess.run([sys.executable, '-c', SCRIPT.format(module=module, heavy=HEAVY_MODULES)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.split('\n')
+        times.append(float(output[0]))
+        heavy = output[1]
+    return median(times), heavy
+
+
+def main() -> int:
+    """
+    Benchmarks every module, failing if one is over budget or imports a heavy optional dependency.
+    :return: Exit code
+    """
+    failed = False
+    for module in MODULES:
+        milliseconds, heavy = import_time(module)
+        over_budget = milliseconds > BUDGET
+        failed = failed or over_budget or bool(heavy)
+        print('{:<10} {:8.2f} ms{}{}'.format(module, milliseconds, ' (over budget)' if over_budget else '',
+                                             ' imports ' + heavy if heavy else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
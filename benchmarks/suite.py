@@ -0,0 +1,181 @@
+# suite.py
+#
+# Description : Benchmark suite, scaling of the main operations with genome and population size.
+# ----------------------------------------------------------------------------------------------
+
+# General imports
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+from statistics import median
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+# Project imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evolution import Evolution
+from network import Network
+from parallel import xor_fitness
+from registry import InnovationRegistry
+
+# Constants
+SEED = 0
+INPUTS, OUTPUTS, WEIGHT_RANGE = 3, 2, 2
+GENOME_SIZES = (10, 100, 1000, 10000)
+POPULATION_SIZES = (50, 150, 500)
+GENERATIONS = 3
+
+# Minimum measuring time of each benchmark, in seconds.
+MIN_TIME = 0.2
+
+# A benchmark regresses when it is slower than its baseline by more than this fraction.
+TOLERANCE = 0.25
+
+
+def measure(function: Callable[[], object], min_time: float = MIN_TIME) -> float:
+    """
+    Times a function, calling it at least three times and for at least min_time.
+    :param function: Function to time
+    :param min_time: Minimum total measuring time, in seconds
+    :return: Median time of a call, in seconds
+    """
+    times = []
+    total = 0.0
+    while len(times) < 3 or total < min_time:
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+        total += times[-1]
+    return median(times)
+
+
+def grow_network(genes: int, registry: InnovationRegistry) -> Network:
+    """
+    Grows a network by structural mutations until it has a number of connection genes.
+    :param genes: Number of connection genes
+    :param registry: Registry numbering the mutations
+    :return: Network
+    """
+    network = Network(INPUTS, OUTPUTS, WEIGHT_RANGE)
+    while len(network.connections) < genes:
+        network.apply_mutation(network.mutate(0.25, 1.0, 0.5, 0.1, registry))
+    return network
+
+
+def genome_benchmarks(genes: int) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """
+    Benchmarks the per-genome operations at a genome size.
+    :param genes: Number of connection genes
+    :return: Time of each operation in seconds, and the node and enabled connection counts of the genome
+    """
+    random.seed(SEED)
+    registry = InnovationRegistry(INPUTS * OUTPUTS, INPUTS + OUTPUTS)
+    network = grow_network(genes, registry)
+    mate = grow_network(genes, registry)
+    inputs = [random.uniform(-1.0, 1.0) for _ in range(INPUTS)]
+    network.compile()
+
+    # Weight mutations change the genome in place, so mutation is measured last, on a copy of the genome.
+    throwaway = network.dna.crossover(network.dna, network.dna)
+
+    def forward_propagate():
+        network.initialize_network(inputs)
+        network.forward_propagate()
+
+    suffix = '/{}'.format(genes)
+    shape = {'nodes': len(network.nodes), 'connections': sum(connection.enabled for connection in network.connections)}
+    return {
+        'get_output' + suffix: measure(lambda: network.get_output(inputs)),
+        'forward_propagate' + suffix: measure(forward_propagate),
+        'get_available_connections' + suffix: measure(network.dna.get_available_connections),
+        'crossover' + suffix: measure(lambda: network.dna.crossover(mate.dna, None)),
+        'construction' + suffix: measure(lambda: Network(INPUTS, OUTPUTS, WEIGHT_RANGE, network.dna)),
+        'mutate' + suffix: measure(lambda: throwaway.mutate(0.03, 0.05, 0.8, 0.1, registry)),
+    }, shape
+
+
+def generation_benchmark(population_size: int) -> Dict[str, float]:
+    """
+    Benchmarks whole generations of evolution at a population size.
+    :param population_size: Number of networks
+    :return: Time of a generation, in seconds
+    """
+    random.seed(SEED)
+    evolution = Evolution(2, 1, WEIGHT_RANGE, population_size, xor_fitness)
+    start = perf_counter()
+    for _ in range(GENERATIONS):
+        evolution.run_generation()
+    return {'generation/{}'.format(population_size): (perf_counter() - start) / GENERATIONS}
+
+
+def run(genome_sizes: List[int], population_sizes: List[int]) -> dict:
+    """
+    Runs every benchmark.
+    :param genome_sizes: Genome sizes, in connection genes
+    :param population_sizes: Population sizes
+    :return: Results, with the benchmark times in seconds, and the node and enabled connection counts of the genome
+             of every size
+    """
+    results, genomes = {}, {}
+    for genes in genome_sizes:
+        times, genomes[genes] = genome_benchmarks(genes)
+        results.update(times)
+    for population_size in population_sizes:
+        results.update(generation_benchmark(population_size))
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'seed': SEED, 'genomes': genomes,
+            'results': results}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Compares results against a baseline, printing the ratio of every benchmark found in both.
+    :param results: New results
+    :param baseline: Baseline results
+    :param tolerance: Allowed slowdown fraction
+    :return: Names of the regressed benchmarks
+    """
+    regressions = []
+    for name, seconds in results['results'].items():
+        if name in baseline['results']:
+            ratio = seconds / baseline['results'][name]
+            regressed = ratio > 1.0 + tolerance
+            if regressed:
+                regressions.append(name)
+            print('{:<34} {:12.3f} us {:7.2f}x{}'.format(name, seconds * 1e6, ratio, ' REGRESSED' if regressed else ''))
+    return regressions
+
+
+def main() -> int:
+    """
+    Runs the suite, writing and comparing results as requested on the command line.
+    :return: Exit code, 1 if a benchmark regressed
+    """
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite.')
+    parser.add_argument('--genome-sizes', type=int, nargs='*', default=GENOME_SIZES)
+    parser.add_argument('--population-sizes', type=int, nargs='*', default=POPULATION_SIZES)
+    parser.add_argument('--output', help='Writes the results to this JSON file')
+    parser.add_argument('--baseline', help='Compares the results against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    arguments = parser.parse_args()
+
+    results = run(arguments.genome_sizes, arguments.population_sizes)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            return 1 if compare(results, json.load(baseline_file), arguments.tolerance) else 0
+
+    for genes, shape in results['genomes'].items():
+        print('{:<34} {nodes} nodes, {connections} enabled connections'.format('genome/{}'.format(genes), **shape))
+    for name, seconds in results['results'].items():
+        print('{:<34} {:12.3f} us'.format(name, seconds * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
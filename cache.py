@@ -0,0 +1,117 @@
+# cache.py
+#
+# Description : Fitness cache, keyed by a hash of the genome's content, so identical genomes are evaluated once.
+# -------------------------------------------------------------------------------------------------------------
+
+# General imports
+import json
+import os
+import struct
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Union
+
+# Project imports
+from checkpoint import activation_name
+from dna import Dna
+from packed import NODE_TYPES
+
+# Constants
+INNOVATION = struct.Struct('<iiid')
+NODE = struct.Struct('<idB')
+
+
+def genome_hash(dna: Dna) -> str:
+    """
+    Hashes everything in a dna that affects its network's output: the enabled innovations (numbers, endpoints and
+    weights), and the nodes (numbers, layers, types and activations). Gene order does not matter.
+    :param dna: Dna to hash
+    :return: Hexadecimal hash
+    """
+    genome = blake2b(digest_size=16)
+    for node in sorted(dna.node_gene, key=lambda node: node.number):
+        genome.update(NODE.pack(node.number, node.layer, NODE_TYPES.index(type(node))))
+        genome.update(activation_name(node.activation).encode() + b'\n')
+    genes = dna.innovation_gene
+    enabled = genes.enabled_flags()
+    for index in sorted(range(len(genes)), key=genes.numbers.__getitem__):
+        if enabled[index]:
+            genome.update(INNOVATION.pack(genes.numbers[index], genes.src_numbers[index], genes.dst_numbers[index],
+                                          genes.weights[index]))
+    return genome.hexdigest()
+
+
+class FitnessCache:
+
+    def __init__(self, size: int = 10000, path: Union[str, None] = None):
+        """
+        Remembers the fitness of the most recently used genomes. Only valid for a deterministic fitness function.
+        :param size: Maximum number of genomes remembered, the least recently used ones are evicted
+        :param path: JSON file the cache is loaded from if it exists, and saved to by save
+        """
+        self.size = size
+        self.path = path
+        self.fitness = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            with open(path) as cache_file:
+                self.fitness.update(json.load(cache_file))
+            self.evict()
+
+    def __len__(self) -> int:
+        return len(self.fitness)
+
+    def get(self, key: str) -> Union[float, None]:
+        """
+        Looks up the fitness of a genome.
+        :param key: Genome hash (see genome_hash)
+        :return: Fitness, or None if the genome is not cached
+        """
+        fitness = self.fitness.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.fitness.move_to_end(key)
+        return fitness
+
+    def put(self, key: str, fitness: float) -> None:
+        """
+        Caches the fitness of a genome.
+        :param key: Genome hash (see genome_hash)
+        :param fitness: Genome fitness
+        :return: None
+        """
+        self.fitness[key] = fitness
+        self.fitness.move_to_end(key)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Evicts the least recently used genomes over the cache size.
+        :return: None
+        """
+        while len(self.fitness) > self.size:
+            self.fitness.popitem(last=False)
+
+    def save(self, path: Union[str, None] = None) -> None:
+        """
+        Saves the cache, least recently used first.
+        :param path: JSON file path, the cache's path if not set
+        :return: None
+        """
+        with open(path or self.path, 'w') as cache_file:
+            json.dump(self.fitness, cache_file)
+
+
+if __name__ == '__main__':
+    from network import Network
+
+    print('Testing FitnessCache')
+    network_test = Network(2, 1, 2)
+    cache_test = FitnessCache(size=2)
+    key_test = genome_hash(network_test.dna)
+    print(key_test, cache_test.get(key_test))
+    cache_test.put(key_test, 1.5)
+    print(cache_test.get(genome_hash(network_test.crossover(network_test).dna)), cache_test.hits, cache_test.misses)
@@ -0,0 +1,208 @@
+# checkpoint.py
+#
+# Description : Binary genome format, and memory-mapped population checkpoints.
+# -----------------------------------------------------------------------------
+
+# General imports
+import mmap
+import struct
+import sys
+from array import array
+from importlib import import_module
+from typing import Callable, List, Tuple
+
+# Project imports
+from activations import ACTIVATION_NAMES, get_activation
+from network import Network
+from packed import PackedDna, pack_dna, unpack_dna
+
+# Constants
+MAGIC = b'NEAT'
+VERSION = 1
+
+# Checkpoint header: magic, version, generation, innovation number, node number, number of genomes.
+# It is followed by an offset table of (genomes + 1) record offsets, and the genome records.
+CHECKPOINT_HEADER = struct.Struct('<4sIqqqq')
+OFFSET = struct.Struct('<Q')
+
+# Genome record header: inputs, outputs, weight range, fitness, nodes, innovations, activation names length.
+# It is followed by the activation names and the gene arrays, in PackedDna order.
+GENOME_HEADER = struct.Struct('<iiidiiI')
+NODE_ARRAYS = (('node_numbers', 'i'), ('node_layers', 'd'), ('node_types', 'B'), ('node_activations', 'B'))
+INNOVATION_ARRAYS = (('numbers', 'i'), ('src_numbers', 'i'), ('dst_numbers', 'i'), ('weights', 'd'))
+
+
+def activation_name(activation: Callable[[float], float]) -> str:
+    """
+    Returns the name of an activation function, its registered name if it is registered (see activations), and its
+    importable name otherwise.
+    :param activation: Module level activation function
+    :return: Activation name, as name or module:function
+    """
+    name = ACTIVATION_NAMES.get(activation)
+    return name if name is not None else '{}:{}'.format(activation.__module__, activation.__qualname__)
+
+
+def load_activation(name: str) -> Callable[[float], float]:
+    """
+    Finds an activation function by its name, in the registry or by importing it.
+    :param name: Activation name, as name or module:function
+    :return: Activation function
+    """
+    if ':' not in name:
+        return get_activation(name)
+    module, function = name.split(':')
+    return getattr(import_module(module), function)
+
+
+def genome_bytes(packed: PackedDna, fitness: float) -> bytes:
+    """
+    Serializes a packed dna and its fitness.
+    :param packed: Packed dna
+    :param fitness: Dna's network fitness
+    :return: Genome record
+    """
+    names = '\n'.join(activation_name(activation) for activation in packed.activations).encode()
+    parts = [GENOME_HEADER.pack(packed.inputs, packed.outputs, packed.weight_range, fitness,
+                                len(packed.node_numbers), len(packed), len(names)), names]
+    for attribute, _ in NODE_ARRAYS + INNOVATION_ARRAYS:
+        genes = getattr(packed, attribute)
+        if sys.byteorder != 'little':
+            genes = array(genes.typecode, genes)
+            genes.byteswap()
+        parts.append(genes.tobytes())
+    parts.append(bytes(packed.enabled))
+    parts.append(bytes(packed.forward))
+    return b''.join(parts)
+
+
+def read_genome(buffer, offset: int = 0) -> Tuple[PackedDna, float]:
+    """
+    Deserializes a genome record.
+    :param buffer: Buffer holding the record
+    :param offset: Offset of the record in the buffer
+    :return: Packed dna, its fitness
+    """
+    inputs, outputs, weight_range, fitness, nodes, innovations, names_length = GENOME_HEADER.unpack_from(buffer, offset)
+    offset += GENOME_HEADER.size
+    packed = PackedDna(inputs, outputs, weight_range)
+    names = bytes(buffer[offset:offset + names_length]).decode()
+    packed.activations = [load_activation(name) for name in names.split('\n')] if names else []
+    offset += names_length
+
+    for arrays, length in ((NODE_ARRAYS, nodes), (INNOVATION_ARRAYS, innovations)):
+        for attribute, typecode in arrays:
+            genes = array(typecode)
+            genes.frombytes(buffer[offset:offset + length * genes.itemsize])
+            if sys.byteorder != 'little':
+                genes.byteswap()
+            setattr(packed, attribute, genes)
+            offset += length * genes.itemsize
+
+    flags_length = (innovations + 7) // 8
+    packed.enabled = bytearray(buffer[offset:offset + flags_length])
+    packed.forward = bytearray(buffer[offset + flags_length:offset + 2 * flags_length])
+    return packed, fitness
+
+
+def write_checkpoint(path: str, networks: List[Network], generation: int = 0, innovation_number: int = 0,
+                     node_number: int = 0) -> None:
+    """
+    Writes a population checkpoint.
+    :param path: Checkpoint file path
+    :param networks: Population
+    :param generation: Generation number
+    :param innovation_number: Next free innovation number
+    :param node_number: Next free node number
+    :return: None
+    """
+    records = [genome_bytes(pack_dna(network.dna), network.fitness) for network in networks]
+
+    offset = CHECKPOINT_HEADER.size + OFFSET.size * (len(records) + 1)
+    offsets = [offset]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    with open(path, 'wb') as checkpoint_file:
+        checkpoint_file.write(CHECKPOINT_HEADER.pack(MAGIC, VERSION, generation, innovation_number, node_number,
+                                                     len(records)))
+        checkpoint_file.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+        for record in records:
+            checkpoint_file.write(record)
+
+
+class Checkpoint:
+
+    def __init__(self, path: str):
+        """
+        Opens a population checkpoint. The file is memory-mapped, and genomes are only read when accessed.
+        :param path: Checkpoint file path
+        """
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.generation, self.innovation_number, self.node_number, self.size = \
+            CHECKPOINT_HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} checkpoint.'.format(path, VERSION))
+
+    def __enter__(self) -> 'Checkpoint':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Network:
+        return self.network(index)
+
+    def packed(self, index: int) -> Tuple[PackedDna, float]:
+        """
+        Reads a single genome.
+        :param index: Genome index
+        :return: Packed dna, its fitness
+        """
+        if not 0 <= index < self.size:
+            raise IndexError('Genome {} is not in checkpoint.'.format(index))
+        offset, = OFFSET.unpack_from(self.buffer, CHECKPOINT_HEADER.size + OFFSET.size * index)
+        return read_genome(self.buffer, offset)
+
+    def network(self, index: int) -> Network:
+        """
+        Rebuilds a single network.
+        :param index: Genome index
+        :return: Network, with its fitness
+        """
+        packed, fitness = self.packed(index)
+        network = Network(packed.inputs, packed.outputs, packed.weight_range, unpack_dna(packed))
+        network.fitness = fitness
+        return network
+
+    def networks(self) -> List[Network]:
+        """
+        Rebuilds the whole population.
+        :return: All networks
+        """
+        return [self.network(index) for index in range(self.size)]
+
+    def close(self) -> None:
+        """
+        Closes the checkpoint file.
+        :return: None
+        """
+        self.buffer.close()
+        self.file.close()
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    print('Testing Checkpoint')
+    networks_test = [Network(2, 1, 2) for _ in range(3)]
+    path_test = os.path.join(tempfile.gettempdir(), 'neat-checkpoint.bin')
+    write_checkpoint(path_test, networks_test, 1, 2, 3)
+    with Checkpoint(path_test) as checkpoint_test:
+        print(len(checkpoint_test), checkpoint_test.generation, os.path.getsize(path_test))
+        print(checkpoint_test[2].connections, networks_test[2].connections)
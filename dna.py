@@ -4,41 +4,65 @@
 # ----------------------------------------------------------------------
 
 # General imports
-from random import choice, random
-from typing import Tuple, List
+from array import array
+from random import choice, random, randrange
+from typing import Tuple, List, Sequence, Union
 
 # Project imports
-from functions import ignore
-from innovation import Innovation
-from node import *
+from activations import get_activation
+from innovation import Innovation, InnovationGene, InnovationView
+from node import HiddenNode, InputNode, OutputNode
+from registry import InnovationRegistry
+
+# Constants
+CONNECTION_ATTEMPTS = 32
 
 
 class Dna:
 
     node_gene: List[HiddenNode]
 
-    def __init__(self, inputs: int, outputs: int, weight_range: int, empty=False):
+    def __init__(self, inputs: int, outputs: int, weight_range: int, empty=False, activation: str = 'sigmoid'):
+        """
+        :param activation: Registered name of the activation function of the output and new hidden nodes
+                           (see activations.ACTIVATIONS)
+        """
         self.inputs = inputs
         self.outputs = outputs
         self.weight_range = weight_range
         self.empty = empty
+        self.activation = get_activation(activation)
+
+        # Genes, and indexes of the genes kept up to date by add_node and add_connection. The innovations leading out
+        # of each node are indexed by their index in the innovation gene.
+        self.node_gene = []
+        self.innovation_gene = InnovationGene()
+        self.number_nodes = {}
+        self.type_nodes = {InputNode: [], HiddenNode: [], OutputNode: []}
+        self.node_outputs = {}
+
+        # Ids of the nodes only this dna uses, which it may modify in place. Nodes shared with other dna (through
+        # crossover) are copied on write, see own_node. Innovations are never shared, crossover copies them.
+        self.owned = set()
+
+        self.input_nodes = self.type_nodes[InputNode]
+        self.output_nodes = self.type_nodes[OutputNode]
 
         # Generate input and output nodes, if not empty
-        self.node_gene = [InputNode(node_number, 0) if node_number < self.inputs else OutputNode(node_number, 1)
-                          for node_number in range(self.inputs + self.outputs)] if not self.empty else []
-        self.input_nodes = self.node_gene[:self.inputs]
-        self.output_nodes = self.node_gene[-self.outputs:]
+        if not self.empty:
+            for node_number in range(self.inputs + self.outputs):
+                self.add_node(InputNode(node_number, 0) if node_number < self.inputs
+                              else OutputNode(node_number, 1, self.activation))
 
         # Fully connect input and output genes, if not empty
-        self.innovation_gene = []
         if not self.empty:
             for input_node in self.input_nodes:
                 for output_node in self.output_nodes:
-                    self.innovation_gene.append(Innovation(len(self.innovation_gene),
-                                                           input_node.number,
-                                                           output_node.number,
-                                                           self.random_weight(),
-                                                           True, True))
+                    self.add_connection(Innovation(len(self.innovation_gene),
+                                                   input_node.number,
+                                                   output_node.number,
+                                                   self.random_weight(),
+                                                   True, True))
 
     def random_weight(self) -> float:
         """
@@ -53,48 +77,154 @@ class Dna:
         :param number: Node number of the node
         :return: Node with corresponding number
         """
-        node = [node for node in self.node_gene if node.number == number]
+        node = self.number_nodes.get(number)
 
         # Raise index error if node not in dna node gene.
-        if not node:
+        if node is None:
             raise IndexError('Node number {} is not in dna.'.format(number))
-        return node[0]
+        return node
 
     def get_nodes(self, node_type: type, *other_types) -> List[HiddenNode]:
         """
-        Gets all node of a type (or types) for node gene.
+        Gets all node of a type (or types) for node gene, grouped by type.
         :return: list of nodes
         """
-        return [node for node in self.node_gene if type(node) is node_type or type(node) in other_types]
+        return [node for a_type in (node_type,) + other_types for node in self.type_nodes.get(a_type, [])]
+
+    def get_node_connections(self, number: int) -> Tuple[List[InnovationView], List[InnovationView]]:
+        """
+        Returns all innovations leading in and out of a node.
+        :param number: Node number of the node
+        :return: List of source (in) innovations and list of destination (out) innovations
+        """
+        genes = self.innovation_gene
+        return [genes[index] for index, dst_number in enumerate(genes.dst_numbers) if dst_number == number], \
+            [genes[index] for index in self.node_outputs.get(number, ())]
 
-    def new_innovation(self, src_number: int, dst_number: int) -> Tuple[Innovation]:
+    def get_innovation_index(self, innovation: InnovationView) -> int:
+        """
+        Returns the index of an innovation in the innovation gene.
+        :param innovation: Innovation of this dna
+        :return: Index of the innovation
+        """
+        if type(innovation) is not InnovationView or innovation.gene is not self.innovation_gene:
+            raise ValueError('{} is not an innovation of this dna.'.format(innovation))
+        return innovation.index
+
+    def add_node(self, node: HiddenNode, shared: bool = False) -> None:
+        """
+        Adds a node to the node gene, and indexes it.
+        :param node: Node to add, its number must be set
+        :param shared: If the node is shared with another dna
+        :return: None
+        """
+        self.node_gene.append(node)
+        self.number_nodes[node.number] = node
+        self.type_nodes.setdefault(type(node), []).append(node)
+        if not shared:
+            self.owned.add(id(node))
+
+    def add_connection(self, innovation: Union[Innovation, InnovationView]) -> None:
+        """
+        Adds a copy of an innovation to the innovation gene, and indexes it.
+        :param innovation: Innovation to add, its numbers must be set
+        :return: None
+        """
+        self.innovation_gene.append(innovation)
+        self.index_connections(len(self.innovation_gene) - 1)
+
+    def add_connections(self, genes: Sequence[InnovationGene], indexes: Sequence[int]) -> None:
+        """
+        Adds copies of innovations of other dna to the innovation gene at once, and indexes them.
+        :param genes: Innovation genes holding the innovations (see InnovationGene.extend)
+        :param indexes: Index of each innovation in the concatenation of the genes
+        :return: None
+        """
+        start = len(self.innovation_gene)
+        self.innovation_gene.extend(genes, indexes)
+        self.index_connections(start)
+
+    def index_connections(self, start: int) -> None:
+        """
+        Indexes the innovations added to the innovation gene.
+        :param start: Index of the first added innovation
+        :return: None
+        """
+        node_outputs = self.node_outputs
+        for index, src_number in enumerate(self.innovation_gene.src_numbers[start:], start):
+            outputs = node_outputs.get(src_number)
+            if outputs is None:
+                outputs = node_outputs[src_number] = array('i')
+            outputs.append(index)
+
+    def has_avenue(self, src_number: int, dst_number: int) -> bool:
+        """
+        Checks if two nodes are connected.
+        :param src_number: Source node's number
+        :param dst_number: Destination node's number
+        :return: If an innovation leads from the source to the destination node
+        """
+        dst_numbers = self.innovation_gene.dst_numbers
+        return dst_number in [dst_numbers[index] for index in self.node_outputs.get(src_number, ())]
+
+    def own_node(self, node: HiddenNode) -> HiddenNode:
+        """
+        Returns a version of a node that may be modified in place, copying it in place of the node if it is shared.
+        :param node: Node of this dna
+        :return: Node owned by this dna
+        """
+        if id(node) in self.owned:
+            return node
+
+        # Only a copy on write searches the gene lists.
+        copy = node.copy()
+        self.node_gene[self.node_gene.index(node)] = copy
+        self.number_nodes[copy.number] = copy
+        type_nodes = self.type_nodes[type(node)]
+        type_nodes[type_nodes.index(node)] = copy
+        self.owned.add(id(copy))
+        return copy
+
+    def new_innovation(self, src_number: int, dst_number: int,
+                       registry: Union[InnovationRegistry, None] = None) -> Tuple[Innovation]:
         """
         Generates a new innovation gene and adds it to the dna.
         :param src_number: Source node's number.
         :param dst_number: Destination node's number.
+        :param registry: Registry to number the innovation with, if not set the main simulation numbers it
         :return: New innovation
         """
         forward = self.get_number_node(src_number).layer < self.get_number_node(dst_number).layer
-        new_innovation = Innovation(-1, src_number, dst_number, self.random_weight(), True, forward)
+        number = registry.connection(src_number, dst_number) if registry is not None else -1
+        new_innovation = Innovation(number, src_number, dst_number, self.random_weight(), True, forward)
         return new_innovation,
 
-    def new_node(self, target_innovation: Innovation) -> Tuple[HiddenNode, Innovation, Innovation, Innovation]:
+    def new_node(self, target_innovation: InnovationView,
+                 registry: Union[InnovationRegistry, None] = None) -> Tuple[HiddenNode, Innovation, Innovation,
+                                                                            InnovationView]:
         """
         Generates a new node that 'splits' an existing an innovation and generates two new ones.
         One leads into the node with weight 1 and the other lead out of the node with the target
         innovation's weight. The new node's number and the two new innovations numbers will have
         to be set by the main simulation. The target innovation will also need to be disabled by
-        the main simulation.
-        :param target_innovation: Innovation to split
+        the main simulation. If a registry is given, it does both instead.
+        :param target_innovation: Innovation of this dna to split
+        :param registry: Registry to number the new node and innovations with
         :return: The new node, the two new innovations, and the old innovation to disable
         """
         src_node = self.get_number_node(target_innovation.src_number)
         dst_node = self.get_number_node(target_innovation.dst_number)
-        new_node = HiddenNode(None, None)
+        numbers = None, None, None
+        if registry is not None:
+            numbers = registry.split(target_innovation.number, src_node.number, dst_node.number, self.number_nodes)
+            target_innovation.enabled = False
+
+        node_number, source_number, destination_number = numbers
+        new_node = HiddenNode(node_number, None, self.activation)
         forward = src_node.layer < dst_node.layer
-        new_source_innovation = Innovation(None, src_node.number, new_node.number, 1, True, forward)
-        new_destination_innovation = Innovation(None, new_node.number, dst_node.number, target_innovation.weight,
-                                                True, forward)
+        new_source_innovation = Innovation(source_number, src_node.number, new_node.number, 1, True, forward)
+        new_destination_innovation = Innovation(destination_number, new_node.number, dst_node.number,
+                                                target_innovation.weight, True, forward)
         return new_node, new_source_innovation, new_destination_innovation, target_innovation
 
     def get_available_connections(self) -> List[Tuple[int, int]]:
@@ -103,22 +233,46 @@ class Dna:
         :return: List of source and destination node numbers
         """
 
-        all_connections = [(innovation.src_number, innovation.dst_number) for innovation in self.innovation_gene]
+        dst_nodes = [node for node in self.node_gene if type(node) is not InputNode]
+        dst_numbers = self.innovation_gene.dst_numbers
 
         available_connections = []
         for src_node in self.node_gene:
-            for dst_node in ignore(self.node_gene, *self.input_nodes):
-                avenue = src_node.number, dst_node.number
-                if avenue not in all_connections:
+            destinations = {dst_numbers[index] for index in self.node_outputs.get(src_node.number, ())}
+            for dst_node in dst_nodes:
+                if dst_node.number not in destinations:
                     if type(src_node) is HiddenNode:
-                        available_connections.append(avenue)
+                        available_connections.append((src_node.number, dst_node.number))
                     elif type(src_node) is not type(dst_node):
-                        available_connections.append(avenue)
+                        available_connections.append((src_node.number, dst_node.number))
 
         return available_connections
 
+    def random_available_connection(self) -> Union[Tuple[int, int], None]:
+        """
+        Picks a random source and destination node pair that is not connected, uniformly like
+        choice(get_available_connections()) but without enumerating all pairs. Random pairs are drawn until one is
+        available, and only when the network is nearly fully connected are all pairs enumerated.
+        :return: Source and destination node numbers, or None if all possible pairs are connected
+        """
+        hidden_nodes, output_nodes = self.type_nodes[HiddenNode], self.type_nodes[OutputNode]
+
+        for _ in range(CONNECTION_ATTEMPTS):
+            src_node = choice(self.node_gene)
+            dst_index = randrange(len(hidden_nodes) + len(output_nodes))
+            dst_node = hidden_nodes[dst_index] if dst_index < len(hidden_nodes) else \
+                output_nodes[dst_index - len(hidden_nodes)]
+
+            if not self.has_avenue(src_node.number, dst_node.number) and \
+                    (type(src_node) is HiddenNode or type(src_node) is not type(dst_node)):
+                return src_node.number, dst_node.number
+
+        available_connections = self.get_available_connections()
+        return choice(available_connections) if available_connections else None
+
     def mutate(self, node_mutation_rate: float, innovation_mutation_rate: float,
-               weight_mutation_rate: float, random_weight_rate: float) -> list:
+               weight_mutation_rate: float, random_weight_rate: float,
+               registry: Union[InnovationRegistry, None] = None) -> list:
         """
         Can mutate the genome by adding a node mutation or a connection mutation, and it might also mutate a weight.
         :param node_mutation_rate: Probability for a node mutation
@@ -126,6 +280,7 @@ class Dna:
         :param weight_mutation_rate: Probability for a node mutation
         :param random_weight_rate: Probability for a weight to be changed to a totally random value,
                                    instead of being perturbed
+        :param registry: Registry that configures the mutations, if not set the main simulation configures them
         :return: All mutations that occurred
         """
 
@@ -134,24 +289,25 @@ class Dna:
         # Node mutation
         if random() < node_mutation_rate:
             target_innovation = choice(self.innovation_gene)
-            mutations.append(self.new_node(target_innovation))
+            mutations.append(self.new_node(target_innovation, registry))
 
         # Connection mutation
         if random() < innovation_mutation_rate:
-            available_connections = self.get_available_connections()
-            if available_connections:
-                src_number, dst_number = choice(available_connections)
-                mutations.append(self.new_innovation(src_number, dst_number))
+            avenue = self.random_available_connection()
+            if avenue:
+                src_number, dst_number = avenue
+                mutations.append(self.new_innovation(src_number, dst_number, registry))
 
         # Mutate a weight
         if random() < weight_mutation_rate:
-            innovation = choice(self.innovation_gene)
+            weights = self.innovation_gene.weights
+            index = randrange(len(weights))
 
             # Mutate the weight either by completely changing it, or slightly perturbing it
             if random() < random_weight_rate:
-                innovation.weight = random() * self.weight_range * 2 - self.weight_range
+                weights[index] = random() * self.weight_range * 2 - self.weight_range
             else:
-                innovation.weight += random() * self.weight_range / 8.0
+                weights[index] += random() * self.weight_range / 8.0
 
         return mutations
 
@@ -163,43 +319,43 @@ class Dna:
         :return: Child's dna
         """
 
-        def sort_innovations(a_innovations: list, b_innovations: list) -> tuple:
+        def sort_innovations(a_gene: InnovationGene, b_gene: InnovationGene) -> tuple:
             """
-            Sorts innovations from both parents into matching, a-specific and b-specific innovations lists.
-            :param a_innovations: Parent A's innovations
-            :param b_innovations: Parent B's innovations
-            :return: Matching innovations, non-matching innovations
+            Sorts innovations from both parents into matching, a-specific and b-specific innovations lists,
+            by innovation number. Innovations are given as their index in the concatenation of both genes.
+            :param a_gene: Parent A's innovation gene
+            :param b_gene: Parent B's innovation gene
+            :return: Matching innovation pairs, non-matching innovations
             """
-            ab_matching, a_specific, b_specific = [], [], []
+            b_numbers = {number: index for index, number in enumerate(b_gene.numbers, len(a_gene))}
+            ab_matching, a_specific = [], []
 
             # Check for innovations present in both parents, and innovations present only in parent A.
-            for a_innovation in a_innovations:
-                if a_innovation in b_innovations:
-                    ab_matching.append(a_innovation)
+            for a_index, number in enumerate(a_gene.numbers):
+                b_index = b_numbers.pop(number, None)
+                if b_index is not None:
+                    ab_matching.append((a_index, b_index))
                 else:
-                    a_specific.append(a_innovation)
+                    a_specific.append(a_index)
 
-            # Check for innovations present only in parent B.
-            for b_innovation in b_innovations:
-                if b_innovation not in a_innovations:
-                    b_specific.append(b_innovation)
+            # Innovations left unmatched are present only in parent B.
+            b_specific = list(b_numbers.values())
 
             return ab_matching, a_specific, b_specific
 
         # Initialize child dna as empty dna.
         child_dna = Dna(self.inputs, self.outputs, self.weight_range, empty=True)
+        child_dna.activation = self.activation
 
-        # Get pointers to nodes and innovations
-        child_nodes = child_dna.node_gene
-        child_innovations = child_dna.innovation_gene
+        # Child innovations, added to the child dna once all are chosen.
+        child_innovations = []
 
         # Get sorted innovations.
         matching, self_specific, mate_specific = sort_innovations(self.innovation_gene, mate.innovation_gene)
 
-        # Matching genes are inherited randomly.
-        for innovation in matching:
-            if random() < 0.5:
-                child_innovations.append(innovation)
+        # Matching genes are inherited randomly from either parent.
+        for self_innovation, mate_innovation in matching:
+            child_innovations.append(self_innovation if random() < 0.5 else mate_innovation)
 
         # Non matching genes (A.K.A. disjoint and excess genes) are inherited from the fitter parent.
         if self is fitter_parent:
@@ -213,34 +369,24 @@ class Dna:
                 if random() < 0.5:
                     child_innovations.append(innovation)
 
-        # Add all necessary nodes to child.
-        nodes = set()
-        for child_innovation in child_innovations:
-            nodes.add(child_innovation.src_number)
-            nodes.add(child_innovation.dst_number)
-
-        # Add all input and output nodes (if they were missed in crossover).
-        for node in self.get_nodes(InputNode, OutputNode) + mate.get_nodes(InputNode, OutputNode):
-            nodes.add(node.number)
-
-        # Add all necessary nodes to child dna.
-        for node in nodes:
-
-            # Check if the node is in either parent.
-            for parent in (self, mate):
-
-                # If node is not in self then it will be in mate.
-                try:
-                    child_node = parent.get_number_node(node)
+        # Innovations are copied into the child's arrays at once.
+        child_dna.add_connections((self.innovation_gene, mate.innovation_gene), child_innovations)
 
-                    if child_node not in child_nodes:
-                        child_nodes.append(child_node)
+        # Add all necessary nodes to child, and all input and output nodes (if they were missed in crossover).
+        nodes = set(child_dna.innovation_gene.src_numbers)
+        nodes.update(child_dna.innovation_gene.dst_numbers)
+        nodes.update(node.number for node in self.input_nodes + self.output_nodes)
 
-                        # If node is in self then we can skip over mate, node has already been added.
-                        break
+        # Add all necessary nodes to child dna, preferring self's node when both parents have it.
+        parent_nodes = {node.number: node for node in mate.node_gene}
+        parent_nodes.update((node.number, node) for node in self.node_gene)
+        for node in sorted(nodes):
+            child_dna.add_node(parent_nodes[node], shared=True)
 
-                except IndexError:
-                    continue
+        # Nodes are shared with the child instead of copied, so from now on the parents must copy them on write too.
+        shared = {id(node) for node in child_dna.node_gene}
+        self.owned -= shared
+        mate.owned -= shared
 
         return child_dna
 
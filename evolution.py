@@ -0,0 +1,278 @@
+# evolution.py
+#
+# Description : Runs generations of networks, evaluate -> speciate -> select -> reproduce.
+# ----------------------------------------------------------------------------------------
+
+# General imports
+from random import choice
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple, Union
+
+# Project imports
+import mutation
+from cache import FitnessCache, genome_hash
+from checkpoint import Checkpoint, write_checkpoint
+from network import Network
+from plan import PlanCache
+from registry import InnovationRegistry
+from species import Speciation
+
+# Constants
+PHASES = ('evaluate', 'speciate', 'select', 'reproduce')
+
+
+class Evolution:
+
+    def __init__(self, inputs: int, outputs: int, weight_range: int, population_size: int,
+                 fitness_function: Union[Callable[[Network], float], None] = None, evaluator: object = None,
+                 threshold: float = 3.0, survival_rate: float = 0.2, elitism_size: int = 5,
+                 node_mutation_rate: float = 0.03, innovation_mutation_rate: float = 0.05,
+                 weight_mutation_rate: float = 0.8, random_weight_rate: float = 0.1, memory_size: int = 0,
+                 fitness_cache: Union[FitnessCache, None] = None, plan_cache: Union[PlanCache, None] = None,
+                 prune: bool = False, activation: str = 'sigmoid'):
+        """
+        :param fitness_function: Fitness function of a network, used when there is no evaluator
+        :param evaluator: Object with an evaluate(networks) method that sets each network's fitness
+                          (see ParallelEvaluator). If it also has a submit(network) method, each child is submitted for
+                          evaluation as soon as it is produced, so it is evaluated while the rest of the population
+                          is mutated.
+        :param threshold: Compatibility distance threshold of a species
+        :param survival_rate: Fraction of each species allowed to reproduce
+        :param elitism_size: Species with at least this many members keep their champion unchanged
+        :param memory_size: Number of structural innovations remembered from earlier generations
+        :param fitness_cache: Cache consulted before evaluating a network, so identical genomes are evaluated once
+        :param plan_cache: Cache compiling the networks evaluated in this process, sharing plans between topologies
+        :param prune: If the networks are pruned when compiled (see Network)
+        :param activation: Registered name of the activation function of the output and hidden nodes
+                           (see activations.ACTIVATIONS)
+        """
+        self.inputs = inputs
+        self.outputs = outputs
+        self.weight_range = weight_range
+        self.population_size = population_size
+        self.fitness_function = fitness_function
+        self.evaluator = evaluator
+        self.fitness_cache = fitness_cache
+        self.plan_cache = plan_cache
+        self.survival_rate = survival_rate
+        self.elitism_size = elitism_size
+        self.mutation_rates = (node_mutation_rate, innovation_mutation_rate, weight_mutation_rate, random_weight_rate)
+        self.speciation = Speciation(threshold)
+
+        # Global counters, the initial networks share their input, output and connection numbers.
+        self.registry = InnovationRegistry(inputs * outputs, inputs + outputs, memory_size)
+
+        self.generation = 0
+        self.prune = prune
+        self.population = [Network(inputs, outputs, weight_range, prune=prune, activation=activation)
+                           for _ in range(population_size)]
+        self.species = []
+        self.parents = []
+        self.pending = None
+        self.keys = []
+        self.best = None
+
+        # Duration of each phase in the last generation, and hooks called after each phase as hook(self, phase, time).
+        self.timings: Dict[str, float] = {}
+        self.hooks: List[Callable[['Evolution', str, float], None]] = []
+
+    def run(self, generations: int) -> Network:
+        """
+        Runs a number of generations.
+        :param generations: Number of generations to run
+        :return: Best network found
+        """
+        for _ in range(generations):
+            self.run_generation()
+
+        # Evaluate the last generation, so its fitness is known.
+        self.evaluate()
+        return self.best
+
+    def run_generation(self) -> None:
+        """
+        Runs every phase of a single generation, timing each phase.
+        :return: None
+        """
+        for phase in PHASES:
+            start = perf_counter()
+            getattr(self, phase)()
+            self.timings[phase] = perf_counter() - start
+            for hook in self.hooks:
+                hook(self, phase, self.timings[phase])
+        self.generation += 1
+
+    def evaluate(self) -> None:
+        """
+        Sets the fitness of every network in the population, collecting submitted evaluations if there are any.
+        :return: None
+        """
+        if self.pending is not None:
+            for network, future in self.pending:
+                network.fitness = future.result()
+        else:
+            networks = self.uncached(self.population)
+            if self.plan_cache is not None:
+                for network in networks:
+                    self.plan_cache.compile(network)
+            if self.evaluator is not None:
+                self.evaluator.evaluate(networks)
+            else:
+                for network in networks:
+                    network.fitness = self.fitness_function(network)
+        self.pending = None
+
+        if self.fitness_cache is not None:
+            for network, key in zip(self.population, self.keys):
+                self.fitness_cache.put(key, network.fitness)
+
+        best = max(self.population, key=lambda network: network.fitness)
+        if self.best is None or best.fitness >= self.best.fitness:
+            self.best = best
+
+    def uncached(self, networks: List[Network]) -> List[Network]:
+        """
+        Sets the fitness of the networks found in the fitness cache, remembering every network's key.
+        :param networks: Networks about to be evaluated
+        :return: Networks that still need to be evaluated
+        """
+        if self.fitness_cache is None:
+            return networks
+
+        lookups = [self.lookup(network) for network in networks]
+        self.keys = [key for key, _ in lookups]
+        return [network for network, (_, found) in zip(networks, lookups) if not found]
+
+    def lookup(self, network: Network) -> Tuple[str, bool]:
+        """
+        Looks up a network in the fitness cache, and sets its fitness if it is found.
+        :param network: Network about to be evaluated
+        :return: Network's key (see genome_hash), if its fitness was found
+        """
+        key = genome_hash(network.dna)
+        fitness = self.fitness_cache.get(key)
+        if fitness is not None:
+            network.fitness = fitness
+        return key, fitness is not None
+
+    def submit(self, network: Network, keys: Dict[int, str]) -> None:
+        """
+        Submits a produced network to the evaluator, unless its fitness is cached.
+        :param network: Network to evaluate
+        :param keys: Keys of the submitted networks by network id, the network's key is added to it
+        :return: None
+        """
+        if self.fitness_cache is not None:
+            keys[id(network)], found = self.lookup(network)
+            if found:
+                return
+        self.pending.append((network, self.evaluator.submit(network)))
+
+    def speciate(self) -> None:
+        """
+        Assigns every network in the population to a species.
+        :return: None
+        """
+        self.species = self.speciation.speciate(self.population)
+
+    def select(self) -> None:
+        """
+        Chooses each species' parents and its number of offspring, proportional to its average (shared) fitness.
+        :return: None
+        """
+        minimum = min(network.fitness for network in self.population)
+        shared_fitness = [sum(network.fitness - minimum for network in species.members) / len(species.members)
+                          for species in self.species]
+        total = sum(shared_fitness)
+
+        offspring = [int(self.population_size * (fitness / total if total else 1.0 / len(self.species)))
+                     for fitness in shared_fitness]
+
+        # Rounding leftovers go to the fittest species.
+        offspring[shared_fitness.index(max(shared_fitness))] += self.population_size - sum(offspring)
+
+        self.parents = []
+        for species, species_offspring in zip(self.species, offspring):
+            members = sorted(species.members, key=lambda network: network.fitness, reverse=True)
+            survivors = members[:max(1, int(len(members) * self.survival_rate))]
+            self.parents.append((survivors, species_offspring, len(members) >= self.elitism_size))
+
+    def reproduce(self) -> None:
+        """
+        Replaces the population with the offspring of the selected parents, by crossover and mutation.
+        :return: None
+        """
+        # Networks are submitted as soon as they are final, if the evaluator takes submissions.
+        submit = hasattr(self.evaluator, 'submit')
+        self.pending = [] if submit else None
+        keys = {}
+
+        population, mutated = [], []
+        for survivors, offspring, elitism in self.parents:
+            for index in range(offspring):
+
+                # The champion of a big enough species is copied unchanged.
+                if elitism and index == 0:
+                    population.append(survivors[0])
+                    if submit:
+                        self.submit(survivors[0], keys)
+                else:
+                    population.append(choice(survivors).crossover(choice(survivors)))
+                    mutated.append(population[-1])
+
+        # All children are mutated at once.
+        for child, mutations in zip(mutated, mutation.mutate_population(mutated, *self.mutation_rates,
+                                                                        self.registry)):
+            child.apply_mutation(mutations)
+            if submit:
+                self.submit(child, keys)
+
+        if submit and self.fitness_cache is not None:
+            self.keys = [keys[id(network)] for network in population]
+
+        self.population = population
+        self.speciation.next_generation()
+        self.registry.next_generation()
+
+    def save(self, path: str) -> None:
+        """
+        Writes the population and the global counters to a checkpoint file.
+        :param path: Checkpoint file path
+        :return: None
+        """
+        write_checkpoint(path, self.population, self.generation, self.registry.innovation_number,
+                         self.registry.node_number)
+
+    def resume(self, path: str) -> None:
+        """
+        Replaces the population and the global counters with those of a checkpoint file.
+        :param path: Checkpoint file path
+        :return: None
+        """
+        with Checkpoint(path) as checkpoint:
+            self.population = checkpoint.networks()
+            self.generation = checkpoint.generation
+            self.registry.innovation_number = checkpoint.innovation_number
+            self.registry.node_number = checkpoint.node_number
+        for network in self.population:
+            network.prune = self.prune
+        self.population_size = len(self.population)
+        self.pending = None
+
+
+def print_generation(evolution: Evolution, phase: str, _: float) -> None:
+    """
+    Example hook, prints a summary of each generation.
+    :return: None
+    """
+    if phase == PHASES[-1]:
+        print(evolution.generation, evolution.best.fitness, len(evolution.species), evolution.timings)
+
+
+if __name__ == '__main__':
+    from parallel import xor_fitness
+
+    print('Testing Evolution')
+    evolution_test = Evolution(2, 1, 2, 50, xor_fitness)
+    evolution_test.hooks.append(print_generation)
+    print(evolution_test.run(10))
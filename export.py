@@ -0,0 +1,103 @@
+# export.py
+#
+# Description : Freezes a network into standalone Python source, for serving without the training stack.
+# -------------------------------------------------------------------------------------------------------
+
+# General imports
+from math import tanh
+from typing import Callable, List
+
+# Project imports
+from activations import ACTIVATION_NAMES, EXP_LIMIT, hard_sigmoid, identity, neat_sigmoid, relu, sigmoid
+
+# Constants
+HEADER = '''# Exported network, {inputs} inputs -> {outputs} outputs.
+# Generated by export.py, only depends on the math module.
+
+from math import exp, tanh
+
+INPUTS = {inputs}
+OUTPUTS = {outputs}
+
+
+def activate(inputs):
+'''
+
+# Statements applying each built-in activation function to a node's summed input v, in place. They are found by
+# the function itself, not its name, so another function with the same name is never exported as a built-in.
+ACTIVATIONS = {
+    neat_sigmoid: ['{{v}} = 1.0 / (1.0 + exp(-4.9 * {{v}})) if -4.9 * {{v}} < {0!r} else 0.0'.format(EXP_LIMIT)],
+    sigmoid: ['{{v}} = 1.0 / (1.0 + exp(-{{v}})) if {{v}} > {0!r} else 0.0'.format(-EXP_LIMIT)],
+    hard_sigmoid: ['{v} = {v} / 6.0 + 0.5', '{v} = 0.0 if {v} < 0.0 else 1.0 if {v} > 1.0 else {v}'],
+    tanh: ['{v} = tanh({v})'],
+    relu: ['{v} = {v} if {v} > 0.0 else 0.0'],
+    identity: [],
+}
+
+
+def export_source(network) -> str:
+    """
+    Generates the source of a module with a single activate(inputs) function, computing the network's output with
+    straight-line code and the weights inlined. Recurrent connections are ignored, as in Network.get_output.
+    :param network: Network to export
+    :return: Module source
+    """
+    plan = network.compile()
+    terms: List[List[str]] = [[] for _ in range(plan.size)]
+    for src, dst, weight in zip(plan.src, plan.dst, plan.weight):
+        terms[dst].append('v{} * {!r}'.format(src, weight))
+
+    lines = []
+    for index, position in enumerate(plan.input_positions):
+        terms[position].insert(0, 'inputs[{}]'.format(index))
+    for position, bias in enumerate(plan.bias):
+        if bias:
+            terms[position].insert(0, repr(bias))
+
+    for position, activation in enumerate(plan.activations):
+        statements = ACTIVATIONS.get(activation)
+        if statements is None:
+            raise ValueError('Activation {} cannot be exported, only built-in activations can.'.format(
+                ACTIVATION_NAMES.get(activation, activation.__qualname__)))
+        variable = 'v{}'.format(position)
+        lines.append('    {} = {}'.format(variable, ' + '.join(terms[position]) or '0.0'))
+        lines.extend('    ' + statement.format(v=variable) for statement in statements)
+
+    lines.append('    return [{}]'.format(', '.join('v{}'.format(position) for position in plan.output_positions)))
+    return HEADER.format(inputs=len(plan.input_positions), outputs=len(plan.output_positions)) + '\n'.join(lines) + '\n'
+
+
+def export_network(network, path: str) -> None:
+    """
+    Writes a network as a standalone Python module.
+    :param network: Network to export
+    :param path: Module file path
+    :return: None
+    """
+    with open(path, 'w') as module_file:
+        module_file.write(export_source(network))
+
+
+def load_network(path: str) -> Callable[[list], list]:
+    """
+    Loads an exported network. Only the exported module is executed, nothing else is imported.
+    :param path: Module file path
+    :return: Network's activate(inputs) function
+    """
+    with open(path) as module_file:
+        namespace = {}
+        exec(compile(module_file.read(), path, 'exec'), namespace)
+    return namespace['activate']
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+    from network import Network
+
+    print('Testing export')
+    network_test = Network(2, 1, 2)
+    path_test = os.path.join(tempfile.gettempdir(), 'neat_export.py')
+    export_network(network_test, path_test)
+    print(export_source(network_test))
+    print(load_network(path_test)([-1, 0.5]), network_test.get_output([-1, 0.5]))
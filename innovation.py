@@ -1,13 +1,75 @@
 # innovation.py
 # Description : Innovation object, represents connections between nodes.
 # ----------------------------------------------------------------------
-from typing import Union
+
+# General imports
+from array import array
+from operator import itemgetter
+from typing import Iterable, Iterator, Sequence, Union
+
+# Constants
+# Translations between flags, as 0 and 1 bytes, and binary digits, to pack and unpack bits in C.
+FLAG_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+DIGIT_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def pack_bits(flags: Iterable[int]) -> bytearray:
+    """
+    Packs flags into bits, eight flags per byte.
+    :param flags: Flags to pack, as booleans or 0 and 1
+    :return: Packed bits
+    """
+    # The flags are read as a binary number, last flag first, so the first flag is the lowest bit.
+    digits = bytes(flags).translate(FLAG_DIGITS)[::-1]
+    return bytearray(int(digits or b'0', 2).to_bytes((len(digits) + 7) // 8, 'little'))
+
+
+def unpack_bits(bits: bytearray, count: int) -> bytes:
+    """
+    Unpacks the first flags from bits.
+    :param bits: Packed bits, the bits after the flags must be 0
+    :param count: Number of flags
+    :return: Flags, as 0 and 1 bytes
+    """
+
+    # The binary digits of the bits have a leading 1, so the digits of the last flags are kept if they are 0.
+    return bin(int.from_bytes(bits, 'little') | 1 << count)[:2:-1].encode().translate(DIGIT_FLAGS)
+
+
+def get_bit(bits: bytearray, index: int) -> bool:
+    """
+    Unpacks a single flag from bits.
+    :param bits: Packed bits
+    :param index: Index of the flag
+    :return: Flag
+    """
+    return bool(bits[index >> 3] >> (index & 7) & 1)
+
+
+def set_bit(bits: bytearray, index: int, flag: bool) -> None:
+    """
+    Sets a single flag in bits.
+    :param bits: Packed bits
+    :param index: Index of the flag
+    :param flag: Flag
+    :return: None
+    """
+    if flag:
+        bits[index >> 3] |= 1 << (index & 7)
+    else:
+        bits[index >> 3] &= ~(1 << (index & 7)) & 0xff
 
 
 class Innovation:
 
+    __slots__ = ('number', 'src_number', 'dst_number', 'weight', 'enabled', 'forward')
+
     def __init__(self, number: Union[int, None], src_number: Union[int, None], dst_number: Union[int, None],
                  weight: float, enabled: bool, forward: bool):
+        """
+        Innovation outside of a dna, as made by mutations before they are added (see InnovationGene for the genes of
+        a dna).
+        """
         super(Innovation, self).__init__()
         self.number = number
         self.src_number = src_number
@@ -16,6 +78,13 @@ class Innovation:
         self.enabled = enabled
         self.forward = forward
 
+    def copy(self) -> 'Innovation':
+        """
+        Copies the innovation.
+        :return: Copy of the innovation
+        """
+        return Innovation(self.number, self.src_number, self.dst_number, self.weight, self.enabled, self.forward)
+
     def __str__(self) -> str:
         string = "Innovation {}: ({} -> {}) {}"
         return string.format(self.number, self.src_number, self.dst_number,
@@ -24,9 +93,180 @@ class Innovation:
     def __repr__(self) -> str:
         return str(self)
 
+
+class InnovationView:
+
+    __slots__ = ('gene', 'index')
+
+    def __init__(self, gene: 'InnovationGene', index: int):
+        """
+        Innovation of a dna, read and written in place in its innovation gene's arrays.
+        :param gene: Innovation gene holding the innovation
+        :param index: Index of the innovation in the gene
+        """
+        self.gene = gene
+        self.index = index
+
+    @property
+    def number(self) -> int:
+        return self.gene.numbers[self.index]
+
+    @property
+    def src_number(self) -> int:
+        return self.gene.src_numbers[self.index]
+
+    @property
+    def dst_number(self) -> int:
+        return self.gene.dst_numbers[self.index]
+
+    @property
+    def weight(self) -> float:
+        return self.gene.weights[self.index]
+
+    @weight.setter
+    def weight(self, weight: float) -> None:
+        self.gene.weights[self.index] = weight
+
+    @property
+    def enabled(self) -> bool:
+        return get_bit(self.gene.enabled, self.index)
+
+    @enabled.setter
+    def enabled(self, enabled: bool) -> None:
+        set_bit(self.gene.enabled, self.index, enabled)
+
+    @property
+    def forward(self) -> bool:
+        return get_bit(self.gene.forward, self.index)
+
+    def copy(self) -> Innovation:
+        """
+        Copies the innovation out of its gene.
+        :return: Copy of the innovation
+        """
+        return Innovation(self.number, self.src_number, self.dst_number, self.weight, self.enabled, self.forward)
+
+    def __eq__(self, other: object) -> bool:
+        return type(other) is InnovationView and self.gene is other.gene and self.index == other.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.gene), self.index))
+
+    __str__ = Innovation.__str__
+    __repr__ = Innovation.__repr__
+
+
+class InnovationGene:
+
+    __slots__ = ('numbers', 'src_numbers', 'dst_numbers', 'weights', 'enabled', 'forward')
+
+    def __init__(self):
+        """
+        Innovation gene of a dna, stored as one array per field instead of innovation objects, with the enabled and
+        forward flags packed into bits. Indexing it gives a view of an innovation (see InnovationView), hot loops
+        read the arrays directly.
+        """
+        self.numbers = array('i')
+        self.src_numbers = array('i')
+        self.dst_numbers = array('i')
+        self.weights = array('d')
+        self.enabled = bytearray()
+        self.forward = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, index: int) -> InnovationView:
+        if index < 0:
+            index += len(self.numbers)
+        if not 0 <= index < len(self.numbers):
+            raise IndexError('Innovation index {} is out of range.'.format(index))
+        return InnovationView(self, index)
+
+    def __iter__(self) -> Iterator[InnovationView]:
+        return (InnovationView(self, index) for index in range(len(self.numbers)))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, innovation: Union[Innovation, InnovationView]) -> None:
+        """
+        Appends a copy of an innovation, an innovation of another gene is copied from its arrays.
+        :param innovation: Innovation to append, its numbers must be set
+        :return: None
+        """
+        index = len(self.numbers)
+        if not index & 7:
+            self.enabled.append(0)
+            self.forward.append(0)
+
+        if type(innovation) is InnovationView:
+            gene, source = innovation.gene, innovation.index
+            self.numbers.append(gene.numbers[source])
+            self.src_numbers.append(gene.src_numbers[source])
+            self.dst_numbers.append(gene.dst_numbers[source])
+            self.weights.append(gene.weights[source])
+            enabled, forward = get_bit(gene.enabled, source), get_bit(gene.forward, source)
+        else:
+            self.numbers.append(innovation.number)
+            self.src_numbers.append(innovation.src_number)
+            self.dst_numbers.append(innovation.dst_number)
+            self.weights.append(innovation.weight)
+            enabled, forward = innovation.enabled, innovation.forward
+
+        if enabled:
+            self.enabled[-1] |= 1 << (index & 7)
+        if forward:
+            self.forward[-1] |= 1 << (index & 7)
+
+    def extend(self, genes: Sequence['InnovationGene'], indexes: Sequence[int]) -> None:
+        """
+        Appends copies of innovations of other genes, gathered from their arrays at once.
+        :param genes: Genes holding the innovations, anything with the arrays of an innovation gene (like a packed dna)
+        :param indexes: Index of each innovation in the concatenation of the genes
+        :return: None
+        """
+        if not indexes:
+            return
+
+        # itemgetter gathers in C, the extra first index makes it return a tuple even for a single innovation.
+        take = itemgetter(0, *indexes)
+
+        def gather(fields: list) -> tuple:
+            values = fields[0]
+            for more_values in fields[1:]:
+                values = values + more_values
+            return take(values)[1:]
+
+        size = len(self.numbers)
+        self.numbers.extend(gather([gene.numbers for gene in genes]))
+        self.src_numbers.extend(gather([gene.src_numbers for gene in genes]))
+        self.dst_numbers.extend(gather([gene.dst_numbers for gene in genes]))
+        self.weights.extend(gather([gene.weights for gene in genes]))
+        enabled = bytes(gather([unpack_bits(gene.enabled, len(gene)) for gene in genes]))
+        forward = bytes(gather([unpack_bits(gene.forward, len(gene)) for gene in genes]))
+        if size:
+            enabled = unpack_bits(self.enabled, size) + enabled
+            forward = unpack_bits(self.forward, size) + forward
+        self.enabled[:] = pack_bits(enabled)
+        self.forward[:] = pack_bits(forward)
+
+    def enabled_flags(self) -> bytes:
+        """
+        Unpacks the enabled flag of every innovation.
+        :return: Enabled flags, by index, as 0 and 1 bytes
+        """
+        return unpack_bits(self.enabled, len(self.numbers))
+
+
 if __name__ == '__main__':
     print("Testing Innovation")
     test_innovation = Innovation(number=0, src_number=1, dst_number=4, weight=1.3, enabled=True, forward=True)
 
     # Test repr function
     print(test_innovation)
+
+    test_gene = InnovationGene()
+    test_gene.append(test_innovation)
+    test_gene[0].enabled = False
+    print(test_gene, test_gene.weights)
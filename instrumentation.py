@@ -0,0 +1,177 @@
+# instrumentation.py
+#
+# Description : Counters and timers of the main operations, and per generation statistics of evolution runs.
+# ----------------------------------------------------------------------------------------------------------
+
+# General imports
+import csv
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, List
+
+# Project imports
+import mutation
+from dna import Dna
+from evolution import Evolution, PHASES
+from network import Network
+
+# Constants
+# Classes or modules, and the names of their instrumented functions. Evolution calls mutate_population through its
+# module, so wrapping the module attribute instruments it.
+TARGETS = ((Network, 'get_output'), (Network, 'apply_mutation'), (Network, 'set_layers'),
+           (Dna, 'mutate'), (Dna, 'crossover'), (mutation, 'mutate_population'))
+
+
+class MemorySink:
+
+    def __init__(self):
+        self.records: List[tuple] = []
+
+    def __call__(self, generation: int, metrics: Dict[str, float]) -> None:
+        self.records.append((generation, metrics))
+
+
+class CsvSink:
+
+    def __init__(self, path: str):
+        """
+        Writes metrics as generation, metric, value rows.
+        :param path: CSV file path
+        """
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(('generation', 'metric', 'value'))
+
+    def __call__(self, generation: int, metrics: Dict[str, float]) -> None:
+        self.writer.writerows((generation, metric, value) for metric, value in metrics.items())
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class Instrumentation:
+
+    def __init__(self, sinks: List[Callable[[int, Dict[str, float]], None]] = ()):
+        """
+        Counts and times the main operations while enabled, and sends the statistics of every generation to the
+        sinks. A sink is any callable taking (generation, metrics). Nothing is wrapped while disabled, so it then
+        costs nothing. Calls made in evaluator worker processes are not counted.
+        :param sinks: Sinks receiving the metrics of every generation
+        """
+        self.sinks = list(sinks)
+        self.names = ['{}.{}'.format(owner.__name__, name) for owner, name in TARGETS]
+        self.counts = dict.fromkeys(self.names, 0)
+        self.times = dict.fromkeys(self.names, 0.0)
+        self.metrics: Dict[str, float] = {}
+        self.originals = []
+
+    def __enter__(self) -> 'Instrumentation':
+        self.enable()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.disable()
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """
+        Wraps a function, counting and timing its calls.
+        :param name: Name of the counter
+        :param function: Function to wrap
+        :return: Wrapped function
+        """
+        counts, times = self.counts, self.times
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[name] += perf_counter() - start
+                counts[name] += 1
+        return wrapper
+
+    def enable(self) -> None:
+        """
+        Wraps the instrumented methods.
+        :return: None
+        """
+        if self.originals:
+            return
+        for (owner, name), counter in zip(TARGETS, self.names):
+            original = owner.__dict__[name]
+            self.originals.append((owner, name, original))
+            setattr(owner, name, self.timed(counter, original))
+
+    def disable(self) -> None:
+        """
+        Restores the instrumented methods.
+        :return: None
+        """
+        for owner, name, original in self.originals:
+            setattr(owner, name, original)
+        self.originals = []
+
+    def hook(self, evolution: Evolution, phase: str, duration: float) -> None:
+        """
+        Evolution hook (see Evolution.hooks), collects the phase timings and the genome sizes of each generation.
+        :param evolution: Evolution being run
+        :param phase: Finished phase
+        :param duration: Duration of the phase, in seconds
+        :return: None
+        """
+        self.metrics['phase.' + phase] = duration
+
+        # The evaluated population is replaced during reproduction, so its sizes are collected after evaluation.
+        if phase == PHASES[0]:
+            self.metrics.update(genome_histogram(evolution.population))
+        elif phase == PHASES[-1]:
+            self.flush(evolution.generation)
+
+    def flush(self, generation: int) -> None:
+        """
+        Sends the collected metrics to the sinks, and resets them.
+        :param generation: Generation of the metrics
+        :return: None
+        """
+        metrics = self.metrics
+        for name in self.names:
+            metrics[name + '.count'] = self.counts[name]
+            metrics[name + '.time'] = self.times[name]
+            self.counts[name] = 0
+            self.times[name] = 0.0
+
+        for sink in self.sinks:
+            sink(generation, metrics)
+        self.metrics = {}
+
+
+def genome_histogram(networks: List[Network]) -> Dict[str, float]:
+    """
+    Counts the networks by their number of connection genes, in power of two buckets.
+    :param networks: Networks to count
+    :return: Number of networks in each bucket, mean and maximum genome size
+    """
+    sizes = [len(network.connections) for network in networks]
+    histogram = {}
+    for size in sizes:
+        bucket = 'genes.<={}'.format(1 << max(size - 1, 0).bit_length())
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    histogram = {bucket: histogram[bucket] for bucket in sorted(histogram, key=lambda bucket: int(bucket[8:]))}
+    histogram['genes.mean'] = sum(sizes) / len(sizes)
+    histogram['genes.max'] = max(sizes)
+    return histogram
+
+
+if __name__ == '__main__':
+    from parallel import xor_fitness
+
+    print('Testing Instrumentation')
+    evolution_test = Evolution(2, 1, 2, 50, xor_fitness)
+    sink_test = MemorySink()
+    with Instrumentation([sink_test, print]) as instrumentation_test:
+        evolution_test.hooks.append(instrumentation_test.hook)
+        evolution_test.run(3)
+    print(len(sink_test.records))
@@ -2,15 +2,16 @@
 # Description : Network class built by Dna object instructions.
 # -------------------------------------------------------------
 
-# Graphic Imports
+# General Imports
+from bisect import bisect_left
 from random import random
-
-from graphviz import Digraph
 from typing import Union, Tuple, List
 
 # Project Imports
 from dna import Dna, Innovation
-from node import HiddenNode, InputNode, OutputNode
+from node import HiddenNode
+from plan import Plan
+from registry import InnovationRegistry
 
 # Constants
 RENDER_FILE = r'renders/neat-structure.gv'
@@ -18,17 +19,32 @@ RENDER_FILE = r'renders/neat-structure.gv'
 
 class Network:
 
-    def __init__(self, inputs: int, outputs: int, weight_range: int, dna: Union[None, Dna] = None, name: str = ''):
+    def __init__(self, inputs: int, outputs: int, weight_range: int, dna: Union[None, Dna] = None, name: str = '',
+                 prune: bool = False, activation: str = 'sigmoid'):
+        """
+        :param prune: If the compiled plan leaves out the nodes that cannot change an output (see Plan), the dna is
+                      not changed
+        :param activation: Registered name of the activation function of the output and hidden nodes, if the dna is
+                           not given (see activations.ACTIVATIONS)
+        """
         self.inputs = inputs
         self.outputs = outputs
         self.weight_range = weight_range
-        self.dna = dna if dna else Dna(self.inputs, self.outputs, self.weight_range)
+        self.dna = dna if dna else Dna(self.inputs, self.outputs, self.weight_range, activation=activation)
         self.fitness = 0
         self.nodes = self.dna.node_gene
         self.connections = self.dna.innovation_gene
-        self.input_nodes = [node for node in self.nodes if type(node) is InputNode]
-        self.output_nodes = [node for node in self.nodes if type(node) is OutputNode]
+        self.input_nodes = self.dna.input_nodes
+        self.output_nodes = self.dna.output_nodes
+        self.layer_keys = []
         self.layers = self.set_layers()
+        self.prune = prune
+        self.plan = None
+        self.batch_plan = None
+        self.state = None
+        self.values = None
+        self.batch_state = None
+        self.batch_values = None
         self.name = name if name else "Network"
 
     def __str__(self) -> str:
@@ -52,16 +68,110 @@ class Network:
 
     def get_output(self, inputs: list) -> list:
         """
-        Calculates the network output.
+        Calculates the network output, using the compiled plan of the network.
+        :param inputs: Network inputs
+        :return: Network output
+        """
+        return self.compile().get_output(inputs)
+
+    def get_outputs_batch(self, inputs):
+        """
+        Calculates the network output for many input vectors at once, one matrix product per layer.
+        Requires numpy. The outputs agree with get_output up to float rounding (see BatchPlan), not bit for bit.
+        :param inputs: Network inputs, shaped (samples, inputs)
+        :return: Network outputs, as a numpy array shaped (samples, outputs)
+        """
+        return self.get_batch_plan().get_outputs(inputs)
+
+    def step(self, inputs: list) -> list:
+        """
+        Calculates the network output for a single time step. Node values are kept between steps, and recurrent
+        connections carry the values of the previous step.
         :param inputs: Network inputs
         :return: Network output
         """
+        plan = self.compile()
+        if self.state is None or len(self.state) != plan.size:
+            self.state, self.values = [0.0] * plan.size, [0.0] * plan.size
+
+        # The node values of this step are written over the values of the step before the previous one.
+        outputs, values = plan.step(inputs, self.state, self.values)
+        self.state, self.values = values, self.state
+        return outputs
+
+    def step_batch(self, inputs):
+        """
+        Calculates the network output for a single time step of many parallel environments, see step.
+        Requires numpy.
+        :param inputs: Network inputs, shaped (environments, inputs)
+        :return: Network outputs, as a numpy array shaped (environments, outputs)
+        """
+        import numpy as np
+
+        self.get_batch_plan()
+        if self.batch_state is None or self.batch_state.shape != (len(inputs), self.plan.size):
+            shape = len(inputs), self.plan.size
+            self.batch_state, self.batch_values = np.zeros(shape), np.zeros(shape)
+        outputs, values = self.batch_plan.step(inputs, self.batch_state, self.batch_values)
+        self.batch_state, self.batch_values = values, self.batch_state
+        return outputs
+
+    def reset_state(self) -> None:
+        """
+        Resets the node values kept between steps.
+        :return: None
+        """
+        self.state = None
+        self.values = None
+        self.batch_state = None
+        self.batch_values = None
+
+    def get_batch_plan(self):
+        """
+        Returns the vectorized evaluation plan of the network, building it if the topology changed. Large sparse
+        networks get a sparse plan, others a dense one (see sparse.use_sparse). Requires numpy.
+        :return: Batch evaluation plan
+        """
+        from batch import BatchPlan
+        from sparse import SparsePlan, use_sparse
 
-        # Set the inputs as the network inputs, and reset all other nodes.
-        self.initialize_network(inputs)
+        plan = self.compile()
+        if self.batch_plan is None or self.batch_plan.plan is not plan:
+            self.batch_plan = SparsePlan(plan) if use_sparse(plan) else BatchPlan(plan)
+        return self.batch_plan
 
-        # Forward propagate each node's output to all the node it outputs to.
-        return self.forward_propagate()
+    def compile(self) -> Plan:
+        """
+        Returns the compiled evaluation plan of the network, building it if the topology changed.
+        :return: Evaluation plan
+        """
+        if self.plan is None:
+            self.plan = Plan(self.layers, self.connections, self.input_nodes, self.output_nodes, self.prune)
+        return self.plan
+
+    def patch_plan(self) -> None:
+        """
+        Prepares the plan for a topology change. A pruned plan, or a plan sharing its structure with other networks
+        (see PlanCache), cannot be patched, so it is dropped and recompiled when needed.
+        :return: None
+        """
+        if self.plan is not None and (self.plan.pruned or self.plan.template is not None):
+            self.plan = None
+
+    def update_weights(self, index: Union[int, None] = None) -> None:
+        """
+        Updates the plan after weight mutations, which do not change the topology. A pruned plan is recompiled, since
+        its bias depends on the weights.
+        :param index: Index of the only mutated connection, if set only its weight is reloaded
+        :return: None
+        """
+        if self.plan is not None:
+            if self.plan.pruned:
+                self.plan = None
+            elif index is not None:
+                self.plan.update_weight(index)
+            else:
+                self.plan.update_weights()
 
     def initialize_network(self, inputs: list) -> None:
         """
@@ -81,25 +191,28 @@ class Network:
     def forward_propagate(self) -> List[float]:
         """
         Tell each node to send its output to each node it is connected to, by layer.
-        Assumes that the inputs of the network have been set.
+        Assumes that the inputs of the network have been set. This is the uncompiled reference of get_output.
         :return: None
         """
+        node_layers = {node.number: layer for layer in range(len(self.layers)) for node in self.layers[layer]}
+        dst_numbers, weights = self.connections.dst_numbers, self.connections.weights
+        enabled = self.connections.enabled_flags()
 
         # Iterate over all layers, and send node outputs in that order.
-        for layer in self.layers:
-            for node in layer:
+        for layer in range(len(self.layers)):
+            for node in self.layers[layer]:
 
                 # Calculate node output.
                 node.get_output()
 
-                # Get all connections outputting from node.
-                _, destination_connections = self.get_node_connections(node)
-
-                for connection in destination_connections:
+                # Get all connections outputting from node, by index.
+                for index in self.dna.node_outputs.get(node.number, ()):
 
-                    # Send this nodes signal to destination node.
-                    destination_node = self.get_node(connection.dst_number)
-                    destination_node.inputs.append(node.output)
+                    # Send this nodes weighted signal to destination node, if it is enabled and leads forward.
+                    dst_number = dst_numbers[index]
+                    if enabled[index] and node_layers[dst_number] > layer:
+                        destination_node = self.get_node(dst_number)
+                        destination_node.inputs.append(node.output * weights[index])
 
         # Return the output of all output nodes.
         return [node.get_output() for node in self.output_nodes]
@@ -110,10 +223,7 @@ class Network:
         :param node: Node to get connections for
         :return: List of source (in) connections and list of destination (out) connections
         """
-        source_connections = [connection for connection in self.connections if connection.dst_number == node.number]
-        destination_connections = [connection for connection in self.connections
-                                   if connection.src_number == node.number]
-        return source_connections, destination_connections
+        return self.dna.get_node_connections(node.number)
 
     def add_connection(self, connection: Innovation) -> None:
         """
@@ -121,29 +231,36 @@ class Network:
         :param connection: Connection to add
         :return: None
         """
-        self.dna.innovation_gene.append(connection)
+        self.dna.add_connection(connection)
+        self.patch_plan()
+        if self.plan is not None:
+            self.plan.insert_connection(len(self.connections) - 1)
+        self.batch_plan = None
 
-    def add_node(self, node: HiddenNode, layer: int, new_layer: bool) -> None:
+    def add_node(self, node: HiddenNode, layer: float) -> None:
         """
-        Adds a node to the network.
+        Adds a node to the network. Layers are ordered by their key, so a node between two layers is added as a new
+        layer without renumbering any other node.
         :param node: Node to add
-        :param layer: Node layer
-        :param new_layer: Need to create new layer
+        :param layer: Node layer key
         :return: None
         """
         node.layer = layer
-        self.dna.node_gene.append(node)
+        self.dna.add_node(node)
 
         # Create a new layer if needed.
+        index = bisect_left(self.layer_keys, layer)
+        new_layer = index == len(self.layer_keys) or self.layer_keys[index] != layer
         if new_layer:
-            self.layers.insert(layer, [node])
-
-            # Re-assign node numbers
-            for layer in range(len(self.layers)):
-                for node in self.layers[layer]:
-                    node.layer = layer
+            self.layer_keys.insert(index, layer)
+            self.layers.insert(index, [node])
         else:
-            self.layers[layer].append(node)
+            self.layers[index].append(node)
+
+        self.patch_plan()
+        if self.plan is not None:
+            self.plan.insert_node(node, index, new_layer)
+        self.batch_plan = None
 
     def get_node(self, node_number: int) -> HiddenNode:
         """
@@ -151,10 +268,11 @@ class Network:
         :param node_number: Number of the node
         :return: Node with correct number
         """
-        return [node for node in self.nodes if node.number == node_number][0]
+        return self.dna.get_number_node(node_number)
 
     def mutate(self, node_mutation_rate: float, innovation_mutation_rate: float,
-               weight_mutation_rate: float, random_weight_rate: float) -> list:
+               weight_mutation_rate: float, random_weight_rate: float,
+               registry: Union[InnovationRegistry, None] = None) -> list:
         """
         Can mutate the genome by adding a node mutation or a connection mutation, and it might also mutate a weight.
         :param node_mutation_rate: Probability for a node mutation
@@ -162,9 +280,14 @@ class Network:
         :param weight_mutation_rate: Probability for a node mutation
         :param random_weight_rate: Probability for a weight to be changed to a totally random value,
                                    instead of being perturbed
+        :param registry: Registry that configures the mutations, if not set the main simulation configures them
         :return: All mutations that occurred
         """
-        return self.dna.mutate(node_mutation_rate, innovation_mutation_rate, weight_mutation_rate, random_weight_rate)
+        mutations = self.dna.mutate(node_mutation_rate, innovation_mutation_rate, weight_mutation_rate,
+                                    random_weight_rate, registry)
+
+        self.update_weights()
+        return mutations
 
     def apply_mutation(self, mutations: list) -> None:
         """
@@ -179,14 +302,19 @@ class Network:
                 node, src, dst, target = mutation
                 src_node, dst_node = self.get_node(target.src_number), self.get_node(target.dst_number)
 
-                # Round up node layer.
+                # The node is placed halfway between the target's nodes. Once repeated splits exhaust the float
+                # precision between two layers, the layer keys are spread out again.
                 node_layer = (src_node.layer + dst_node.layer) / 2.0
-                node_layer = int(node_layer + int(target.forward)) \
-                    if node_layer % 10.0 >= 0.5 else int(node_layer + int(not target.forward))
-                new_layer = node_layer == src_node.layer or node_layer == dst_node.layer
-                self.add_node(node, node_layer, new_layer)
+                if src_node.layer != dst_node.layer and node_layer in (src_node.layer, dst_node.layer):
+                    self.spread_layers()
+                    src_node, dst_node = self.get_node(target.src_number), self.get_node(target.dst_number)
+                    node_layer = (src_node.layer + dst_node.layer) / 2.0
+
+                self.add_node(node, node_layer)
                 self.add_connection(src)
                 self.add_connection(dst)
+                if self.plan is not None:
+                    self.plan.remove_connection(self.dna.get_innovation_index(target))
 
             # Connection mutation.
             elif len(mutation) == 1:
@@ -202,12 +330,12 @@ class Network:
         fitter_network = self if self.fitness > mate.fitness else mate if self.fitness < mate.fitness else None
         fitter_dna = fitter_network.dna if fitter_network else None
         child_dna = self.dna.crossover(mate.dna, fitter_dna)
-        child = Network(self.inputs, self.outputs, self.weight_range, child_dna, name)
+        child = Network(self.inputs, self.outputs, self.weight_range, child_dna, name, self.prune)
         return child
 
     def set_layers(self):
         """
-        Set each node in its proper layer.
+        Set each node in its proper layer, ordering the layers by their keys.
         :return: Set layers.
         """
         layers = {}
@@ -217,12 +345,24 @@ class Network:
             else:
                 layers[node.layer] = [node]
 
-        sorted_layers = [[node for node in layers[layer]] for layer in sorted(layers.keys())]
-        for layer in range(len(sorted_layers)):
-            for node in sorted_layers[layer]:
-                node.layer = layer
+        self.layer_keys = sorted(layers.keys())
+        return [layers[layer] for layer in self.layer_keys]
 
-        return sorted_layers
+    def spread_layers(self) -> None:
+        """
+        Spreads the layer keys evenly between the first and last keys, keeping their order. Shared nodes are copied
+        before their key changes (see Dna.own_node).
+        :return: None
+        """
+        first, last = self.layer_keys[0], self.layer_keys[-1]
+        for index in range(len(self.layers)):
+            key = first + (last - first) * index / (len(self.layers) - 1.0)
+            self.layer_keys[index] = key
+            nodes = self.layers[index]
+            for node_index in range(len(nodes)):
+                nodes[node_index] = self.dna.own_node(nodes[node_index])
+                nodes[node_index].layer = key
+        self.plan = None
 
     def render(self, view: bool = True) -> None:
         """
@@ -231,6 +371,12 @@ class Network:
         :return: None
         """
 
+        # Graphviz is optional, it is only needed for rendering.
+        try:
+            from graphviz import Digraph
+        except ImportError:
+            raise ImportError('Rendering a network requires graphviz, install it with pip install graphviz.') from None
+
         # TODO find a way to force layers to a certain rank.
         network_graph = Digraph(comment="NEAT structure", strict=True, graph_attr={"rankdir": "LR",
                                                                                    "splines": None})
@@ -4,30 +4,26 @@
 # ------------------------------------------------------
 
 # Imports
-from math import e
 from typing import Union
 
+# Project imports
+from activations import identity, neat_sigmoid, sigmoid
+
 # String representation of a node
 STRING = "{}: {} (Layer {})"
 
 
-# NEAT paper activation function
-def neat_sigmoid(x: float) -> float:
-    return 1.0 / (1.0 + pow(e, -4.9 * x))
-
-
-# Default activation function
-def sigmoid(x: float) -> float:
-    return 1.0 / (1.0 + pow(e, -x))
-
-
 class HiddenNode:
 
+    __slots__ = ('number', 'layer', 'activation', 'inputs', 'output')
+
     def __init__(self, number: Union[int, None], layer: Union[int, None], activation=sigmoid):
         self.number = number
         self.layer = layer
         self.activation = activation
-        self.inputs = []
+
+        # Only used by the uncompiled Network.forward_propagate, which gives each node an inputs list.
+        self.inputs = ()
         self.output = 0
 
     def get_output(self) -> float:
@@ -38,6 +34,15 @@ class HiddenNode:
         self.output = self.activation(sum(self.inputs))
         return self.output
 
+    def copy(self) -> 'HiddenNode':
+        """
+        Copies the node, without its input and output values.
+        :return: Copy of the node
+        """
+        node = type(self)(self.number, self.layer)
+        node.activation = self.activation
+        return node
+
     def __repr__(self) -> str:
         return STRING.format(self.name(), self.number, self.layer)
 
@@ -54,15 +59,19 @@ class HiddenNode:
 
 class InputNode(HiddenNode):
 
+    __slots__ = ()
+
     def __init__(self, number: Union[int, None], layer: Union[int, None]):
 
-        # The lambda function replaces the activation function so that the output of an input node
-        # is only the sum of its inputs, without activation.
-        super(InputNode, self).__init__(number, layer, lambda x: x)
+        # The identity function replaces the activation function so that the output of an input node
+        # is only the sum of its inputs, without activation. Unlike a lambda it can be pickled.
+        super(InputNode, self).__init__(number, layer, identity)
 
 
 class OutputNode(HiddenNode):
 
+    __slots__ = ()
+
     def __init__(self, number: Union[int, None], layer: Union[int, None], activation=sigmoid):
         super(OutputNode, self).__init__(number, layer, activation)
 
@@ -0,0 +1,130 @@
+# packed.py
+#
+# Description : Compact dna, stored as arrays of genes instead of gene objects, to store and send genomes.
+# -------------------------------------------------------------------------------------------------------
+
+# General imports
+from array import array
+
+# Project imports
+from dna import Dna
+from innovation import Innovation, get_bit
+from node import HiddenNode, InputNode, OutputNode
+
+# Constants
+NODE_TYPES = (InputNode, HiddenNode, OutputNode)
+
+
+class PackedDna:
+
+    __slots__ = ('inputs', 'outputs', 'weight_range', 'node_numbers', 'node_layers', 'node_types', 'node_activations',
+                 'activations', 'numbers', 'src_numbers', 'dst_numbers', 'weights', 'enabled', 'forward')
+
+    def __init__(self, inputs: int, outputs: int, weight_range: int):
+        """
+        Archive and wire form of a dna, used by checkpoints and to send genomes to worker processes. The innovation
+        gene has the layout of the dna's own arrays (see InnovationGene), packing mostly saves the node objects and
+        the indexes of the dna (see pack_dna and unpack_dna).
+        """
+        self.inputs = inputs
+        self.outputs = outputs
+        self.weight_range = weight_range
+
+        # Node gene, with node types as indexes into NODE_TYPES and activations as indexes into activations.
+        self.node_numbers = array('i')
+        self.node_layers = array('d')
+        self.node_types = array('B')
+        self.node_activations = array('B')
+        self.activations = []
+
+        # Innovation gene, with the enabled and forward flags packed into bits.
+        self.numbers = array('i')
+        self.src_numbers = array('i')
+        self.dst_numbers = array('i')
+        self.weights = array('d')
+        self.enabled = bytearray()
+        self.forward = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def innovation(self, index: int) -> Innovation:
+        """
+        Builds a single innovation of the innovation gene.
+        :param index: Index of the innovation
+        :return: Innovation
+        """
+        return Innovation(self.numbers[index], self.src_numbers[index], self.dst_numbers[index], self.weights[index],
+                          get_bit(self.enabled, index), get_bit(self.forward, index))
+
+    def node(self, index: int) -> HiddenNode:
+        """
+        Builds a single node of the node gene.
+        :param index: Index of the node
+        :return: Node
+        """
+        node = NODE_TYPES[self.node_types[index]](self.node_numbers[index], self.node_layers[index])
+        node.activation = self.activations[self.node_activations[index]]
+        return node
+
+    def size(self) -> int:
+        """
+        Returns the number of bytes used by the genes.
+        :return: Size in bytes
+        """
+        arrays = (self.node_numbers, self.node_layers, self.node_types, self.node_activations,
+                  self.numbers, self.src_numbers, self.dst_numbers, self.weights)
+        return sum(len(genes) * genes.itemsize for genes in arrays) + len(self.enabled) + len(self.forward)
+
+
+def pack_dna(dna: Dna) -> PackedDna:
+    """
+    Packs a dna into arrays. The packed dna shares no objects with the dna.
+    :param dna: Dna to pack
+    :return: Packed dna
+    """
+    packed = PackedDna(dna.inputs, dna.outputs, dna.weight_range)
+
+    activations = {}
+    for node in dna.node_gene:
+        packed.node_numbers.append(node.number)
+        packed.node_layers.append(node.layer)
+        packed.node_types.append(NODE_TYPES.index(type(node)))
+        packed.node_activations.append(activations.setdefault(node.activation, len(activations)))
+    packed.activations = list(activations)
+
+    genes = dna.innovation_gene
+    packed.numbers = array('i', genes.numbers)
+    packed.src_numbers = array('i', genes.src_numbers)
+    packed.dst_numbers = array('i', genes.dst_numbers)
+    packed.weights = array('d', genes.weights)
+    packed.enabled = bytearray(genes.enabled)
+    packed.forward = bytearray(genes.forward)
+    return packed
+
+
+def unpack_dna(packed: PackedDna) -> Dna:
+    """
+    Rebuilds a dna from its packed form.
+    :param packed: Packed dna
+    :return: Dna
+    """
+    dna = Dna(packed.inputs, packed.outputs, packed.weight_range, empty=True)
+    for index in range(len(packed.node_numbers)):
+        dna.add_node(packed.node(index))
+    dna.add_connections([packed], range(len(packed)))
+
+    # New hidden nodes get the output nodes' activation function, as in the original dna.
+    if dna.output_nodes:
+        dna.activation = dna.output_nodes[0].activation
+    return dna
+
+
+if __name__ == '__main__':
+    import pickle
+
+    print('Testing PackedDna')
+    dna_test = Dna(4, 3, 2)
+    packed_test = pack_dna(dna_test)
+    print(packed_test.size(), len(pickle.dumps(packed_test)), len(pickle.dumps(dna_test)))
+    print(unpack_dna(packed_test).innovation_gene)
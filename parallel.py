@@ -0,0 +1,121 @@
+# parallel.py
+#
+# Description : Evaluates network fitness on all cores, shipping networks in a compact picklable form.
+# ---------------------------------------------------------------------------------------------------
+
+# General imports
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, List, Union
+
+# Project imports
+from network import Network
+from packed import PackedDna, pack_dna, unpack_dna
+
+
+def pack_network(network: Network) -> PackedDna:
+    """
+    Packs a network's dna into arrays, which are cheap to pickle and share no objects with the network.
+    Node activations are sent by reference, so they must be module level functions.
+    :param network: Network to pack
+    :return: Packed network
+    """
+    return pack_dna(network.dna)
+
+
+def unpack_network(packed: PackedDna) -> Network:
+    """
+    Rebuilds a network from its packed form.
+    :param packed: Packed network
+    :return: Network
+    """
+    return Network(packed.inputs, packed.outputs, packed.weight_range, unpack_dna(packed))
+
+
+def evaluate_packed(fitness_function: Callable[[Network], float], packed: PackedDna) -> float:
+    """
+    Worker side evaluation of a packed network.
+    :param fitness_function: Fitness function of a network
+    :param packed: Packed network
+    :return: Network fitness
+    """
+    return fitness_function(unpack_network(packed))
+
+
+class ParallelEvaluator:
+
+    def __init__(self, fitness_function: Callable[[Network], float], workers: Union[int, None] = None,
+                 chunk_size: int = 1):
+        """
+        :param fitness_function: Fitness function of a network, must be a module level (picklable) function
+        :param workers: Number of worker processes, defaults to the number of cores
+        :param chunk_size: Number of networks sent to a worker at a time
+        """
+        self.fitness_function = fitness_function
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.executor = None
+
+    def __enter__(self) -> 'ParallelEvaluator':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def start(self) -> ProcessPoolExecutor:
+        """
+        Starts the worker processes, if they are not running.
+        :return: Executor of the worker processes
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+        return self.executor
+
+    def submit(self, network: Network) -> Future:
+        """
+        Starts evaluating a single network in the worker processes, without waiting for it.
+        The network's fitness is not set, the caller collects it from the future.
+        :param network: Network to evaluate
+        :return: Future of the network's fitness
+        """
+        return self.start().submit(evaluate_packed, self.fitness_function, pack_network(network))
+
+    def evaluate(self, networks: List[Network]) -> List[float]:
+        """
+        Evaluates all networks in the worker processes, and sets each network's fitness.
+        :param networks: Networks to evaluate
+        :return: Fitness of every network
+        """
+        self.start()
+        fitness = list(self.executor.map(partial(evaluate_packed, self.fitness_function),
+                                         [pack_network(network) for network in networks],
+                                         chunksize=self.chunk_size))
+        for network, network_fitness in zip(networks, fitness):
+            network.fitness = network_fitness
+        return fitness
+
+    def close(self) -> None:
+        """
+        Shuts down the worker processes.
+        :return: None
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def xor_fitness(network: Network) -> float:
+    """
+    Example fitness function, how close the network is to solving XOR.
+    :param network: Network to evaluate
+    :return: Network fitness
+    """
+    return 4 - sum(abs(network.get_output([a, b])[0] - (a ^ b)) for a in (0, 1) for b in (0, 1))
+
+
+if __name__ == '__main__':
+    print('Testing ParallelEvaluator')
+    networks_test = [Network(2, 1, 2) for _ in range(8)]
+    with ParallelEvaluator(xor_fitness, chunk_size=2) as evaluator_test:
+        print(evaluator_test.evaluate(networks_test))
+    print([xor_fitness(network) for network in networks_test])
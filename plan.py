@@ -0,0 +1,411 @@
+# plan.py
+#
+# Description : Compiled evaluation plan, a flat layer-ordered form of a network.
+# -------------------------------------------------------------------------------
+
+# General imports
+from collections import OrderedDict
+from copy import copy
+from typing import Dict, List, Tuple, Union
+
+# Project imports
+from activations import identity
+from innovation import InnovationGene
+from node import HiddenNode
+
+
+class Plan:
+
+    def __init__(self, layers: List[List[HiddenNode]], connections: InnovationGene,
+                 input_nodes: List[HiddenNode], output_nodes: List[HiddenNode], prune: bool = False):
+
+        # Pruning leaves out the nodes that cannot change an output, constant nodes are folded into a bias of the
+        # nodes they send to. The weights of a pruned plan cannot be updated, since the bias depends on them.
+        self.pruned = prune
+        bias = {}
+        if prune:
+            layers, bias = prune_nodes(layers, connections, input_nodes, output_nodes)
+
+        # All nodes in evaluation order, layer by layer.
+        self.nodes = [node for layer in layers for node in layer]
+        self.size = len(self.nodes)
+        self.activations = [node.activation for node in self.nodes]
+        self.bias = [bias.get(node.number, 0.0) for node in self.nodes]
+        self.positions = position = {node.number: index for index, node in enumerate(self.nodes)}
+        node_layer = [layer_index for layer_index, layer in enumerate(layers) for _ in layer]
+
+        # Nodes of layer i are nodes[layer_ends[i - 1]:layer_ends[i]].
+        self.layer_ends = []
+        for layer in layers:
+            self.layer_ends.append(len(layer) + (self.layer_ends[-1] if self.layer_ends else 0))
+
+        self.input_positions = [position[node.number] for node in input_nodes]
+        self.output_positions = [position[node.number] for node in output_nodes]
+
+        # Enabled connections leading into a later layer are propagated, sorted by source position (the sort is
+        # stable, so each node keeps sending in connection order). All other enabled connections are recurrent,
+        # they only carry the previous step's values (see step).
+        edges, recurrent_edges = [], []
+        src_numbers, dst_numbers = connections.src_numbers, connections.dst_numbers
+        for index, enabled in enumerate(connections.enabled_flags()):
+            if enabled:
+                src, dst = position.get(src_numbers[index]), position.get(dst_numbers[index])
+                if src is None or dst is None:
+                    continue
+                if node_layer[src] < node_layer[dst]:
+                    edges.append((src, dst, index))
+                else:
+                    recurrent_edges.append((src, dst, index))
+        edges.sort(key=lambda edge: edge[0])
+
+        # Connections are kept by their index in the innovation gene, whose weights array the weights are read from.
+        self.connections = connections
+        self.indexes = [index for _, _, index in edges]
+        self.src = [src for src, _, _ in edges]
+        self.dst = [dst for _, dst, _ in edges]
+        self.recurrent_indexes = [index for _, _, index in recurrent_edges]
+        self.recurrent_src = [src for src, _, _ in recurrent_edges]
+        self.recurrent_dst = [dst for _, dst, _ in recurrent_edges]
+        self.update_weights()
+
+        # Connections sent by the node at position i are src[ends[i - 1]:ends[i]].
+        self.ends = [0] * self.size
+        for src in self.src:
+            self.ends[src] += 1
+        for index in range(1, self.size):
+            self.ends[index] += self.ends[index - 1]
+
+        # Plan whose structure this plan shares, if it comes from a PlanCache. A shared plan is never patched.
+        self.template: Union[Plan, None] = None
+
+    def insert_node(self, node: HiddenNode, layer: int, new_layer: bool) -> None:
+        """
+        Inserts a node without connections at the end of a layer, or as a new layer, without recompiling.
+        :param node: Node to insert
+        :param layer: Index of the node's layer
+        :param new_layer: If the node is a new layer inserted before the current layer at that index
+        :return: None
+        """
+        if new_layer:
+            position = self.layer_ends[layer - 1] if layer else 0
+            self.layer_ends.insert(layer, position)
+        else:
+            position = self.layer_ends[layer]
+        for index in range(layer, len(self.layer_ends)):
+            self.layer_ends[index] += 1
+
+        # Every position after the node moves by one, in place. Connections are sorted by source position, so the
+        # ones sent by the moved nodes are the last ones, but the destinations are in no order and are all checked.
+        for index, moved in enumerate(self.nodes[position:], position + 1):
+            self.positions[moved.number] = index
+        self.positions[node.number] = position
+        for edge in range(self.ends[position - 1] if position else 0, len(self.src)):
+            self.src[edge] += 1
+        for positions in (self.dst, self.recurrent_src, self.recurrent_dst):
+            for edge, index in enumerate(positions):
+                if index >= position:
+                    positions[edge] = index + 1
+        self.input_positions = [index + (index >= position) for index in self.input_positions]
+        self.output_positions = [index + (index >= position) for index in self.output_positions]
+
+        self.nodes.insert(position, node)
+        self.activations.insert(position, node.activation)
+        self.bias.insert(position, 0.0)
+        self.ends.insert(position, self.ends[position - 1] if position else 0)
+        self.size += 1
+
+    def insert_connection(self, index: int) -> None:
+        """
+        Inserts a connection, if it is enabled, without recompiling.
+        :param index: Index of the connection in the network's connections
+        :return: None
+        """
+        connection = self.connections[index]
+        src, dst = self.positions[connection.src_number], self.positions[connection.dst_number]
+        if not connection.enabled:
+            return
+        if self.nodes[src].layer >= self.nodes[dst].layer:
+            self.recurrent_indexes.append(index)
+            self.recurrent_src.append(src)
+            self.recurrent_dst.append(dst)
+            self.recurrent_weight.append(connection.weight)
+            return
+
+        edge = self.ends[src]
+        self.indexes.insert(edge, index)
+        self.src.insert(edge, src)
+        self.dst.insert(edge, dst)
+        self.weight.insert(edge, connection.weight)
+        for position in range(src, self.size):
+            self.ends[position] += 1
+
+    def remove_connection(self, index: int) -> None:
+        """
+        Removes a connection, if it is in the plan, without recompiling.
+        :param index: Index of the connection in the network's connections
+        :return: None
+        """
+        connection = self.connections[index]
+        src, dst = self.positions[connection.src_number], self.positions[connection.dst_number]
+        if self.nodes[src].layer >= self.nodes[dst].layer:
+            if index in self.recurrent_indexes:
+                edge = self.recurrent_indexes.index(index)
+                del self.recurrent_indexes[edge], self.recurrent_src[edge], self.recurrent_dst[edge]
+                del self.recurrent_weight[edge]
+            return
+
+        # Only the connections sent by the source node are searched.
+        start, end = self.ends[src - 1] if src else 0, self.ends[src]
+        if index not in self.indexes[start:end]:
+            return
+
+        edge = self.indexes.index(index, start, end)
+        del self.indexes[edge], self.src[edge], self.dst[edge], self.weight[edge]
+        for position in range(src, self.size):
+            self.ends[position] -= 1
+
+    def update_weights(self) -> None:
+        """
+        Reloads the connection weights, for when weights changed but the topology did not.
+        :return: None
+        """
+        weights = self.connections.weights
+        self.weight = [weights[index] for index in self.indexes]
+        self.recurrent_weight = [weights[index] for index in self.recurrent_indexes]
+
+    def update_weight(self, index: int) -> None:
+        """
+        Reloads the weight of a single connection. Like update_weights, the weight lists are replaced, not modified.
+        :param index: Index of the connection in the network's connections
+        :return: None
+        """
+        src = self.positions.get(self.connections.src_numbers[index])
+        if src is None:
+            return
+        weight = self.connections.weights[index]
+
+        # Only the connections sent by the source node are searched.
+        start, end = self.ends[src - 1] if src else 0, self.ends[src]
+        if index in self.indexes[start:end]:
+            self.weight = self.weight[:]
+            self.weight[self.indexes.index(index, start, end)] = weight
+        elif index in self.recurrent_indexes:
+            self.recurrent_weight = self.recurrent_weight[:]
+            self.recurrent_weight[self.recurrent_indexes.index(index)] = weight
+
+    def get_output(self, inputs: list) -> list:
+        """
+        Calculates the network output. Recurrent connections are ignored.
+        :param inputs: Network inputs
+        :return: Network output
+        """
+        values = self.bias[:]
+        for position, value in zip(self.input_positions, inputs):
+            values[position] = value
+
+        self.propagate(values)
+        return [values[position] for position in self.output_positions]
+
+    def step(self, inputs: list, state: list, values: Union[list, None] = None) -> Tuple[list, list]:
+        """
+        Calculates the network output for a single time step, where recurrent connections carry the node values of
+        the previous step.
+        :param inputs: Network inputs
+        :param state: Node values of the previous step, by position (zeros before the first step)
+        :param values: List the node values of this step are written to, as long as state and distinct from it, so
+                       steps can alternate between two lists. A new list is allocated if not set
+        :return: Network output, node values of this step
+        """
+        if values is None:
+            values = self.bias[:]
+        else:
+            values[:] = self.bias
+        for position, value in zip(self.input_positions, inputs):
+            values[position] = value
+        for src, dst, weight in zip(self.recurrent_src, self.recurrent_dst, self.recurrent_weight):
+            values[dst] += state[src] * weight
+
+        self.propagate(values)
+        return [values[position] for position in self.output_positions], values
+
+    def propagate(self, values: list) -> None:
+        """
+        Activates every node and sends its output through its forward connections, in place.
+        :param values: Summed inputs of every node, by position, replaced by the node outputs
+        :return: None
+        """
+
+        # Every connection leads forward, so each node's summed input is final once it is reached. Identity
+        # activations (input nodes) are not called.
+        activations, ends, dst, weight = self.activations, self.ends, self.dst, self.weight
+        start = 0
+        for position in range(self.size):
+            output = values[position]
+            activation = activations[position]
+            if activation is not identity:
+                output = values[position] = activation(output)
+            end = ends[position]
+            for edge in range(start, end):
+                values[dst[edge]] += output * weight[edge]
+            start = end
+
+
+def prune_nodes(layers: List[List[HiddenNode]], connections: InnovationGene, input_nodes: List[HiddenNode],
+                output_nodes: List[HiddenNode]) -> Tuple[List[List[HiddenNode]], Dict[int, float]]:
+    """
+    Finds the nodes that cannot change an output: nodes without a path to an output node, and hidden nodes with a
+    constant output, whose inputs (if any) all come from earlier constant nodes. A constant node sending through a
+    recurrent connection is kept, since its previous value is 0 on the first step.
+    :return: Layers without the removed nodes (and without empty layers),
+             bias of each node receiving from a removed constant node, by node number
+    """
+    layer_index = {node.number: index for index, layer in enumerate(layers) for node in layer}
+    src_numbers, dst_numbers, weights = connections.src_numbers, connections.dst_numbers, connections.weights
+
+    # Incoming connections of every node, as source numbers and weights.
+    incoming = {number: [] for number in layer_index}
+    recurrent_sources = set()
+    for index, enabled in enumerate(connections.enabled_flags()):
+        if enabled:
+            src_number, dst_number = src_numbers[index], dst_numbers[index]
+            incoming[dst_number].append((src_number, weights[index]))
+            if layer_index[src_number] >= layer_index[dst_number]:
+                recurrent_sources.add(src_number)
+
+    # Nodes with a path to an output, through forward or recurrent connections.
+    live = {node.number for node in output_nodes}
+    pending = list(live)
+    while pending:
+        for src_number, _ in incoming[pending.pop()]:
+            if src_number not in live:
+                live.add(src_number)
+                pending.append(src_number)
+
+    # Constant nodes, computed layer by layer.
+    inputs = {node.number for node in input_nodes}
+    constants = {}
+    for index, layer in enumerate(layers):
+        for node in layer:
+            node_inputs = incoming[node.number]
+            if node.number not in inputs and all(src_number in constants and layer_index[src_number] < index
+                                                 for src_number, _ in node_inputs):
+                total = 0.0
+                for src_number, weight in node_inputs:
+                    total += constants[src_number] * weight
+                constants[node.number] = node.activation(total)
+
+    outputs = {node.number for node in output_nodes}
+    removed = {number for number in layer_index if number not in live and number not in inputs}
+    removed.update(number for number in constants if number not in outputs and number not in recurrent_sources)
+
+    bias = {}
+    for number in layer_index:
+        if number not in removed:
+            for src_number, weight in incoming[number]:
+                if src_number in removed:
+                    bias[number] = bias.get(number, 0.0) + constants[src_number] * weight
+
+    layers = [[node for node in layer if node.number not in removed] for layer in layers]
+    return [layer for layer in layers if layer], bias
+
+
+def topology(layers: List[List[HiddenNode]], connections: InnovationGene, input_nodes: List[HiddenNode],
+             output_nodes: List[HiddenNode]) -> Tuple[Union[tuple, None], Dict[int, int]]:
+    """
+    Returns the topology signature of a network, equal for networks that only differ by their weights.
+    Connections are identified by their source and destination numbers, packed into a single integer.
+    :return: Topology signature (None if the network has several enabled connections between the same nodes),
+             index of each enabled connection by its packed source and destination numbers
+    """
+    src_numbers, dst_numbers = connections.src_numbers, connections.dst_numbers
+    enabled = [index for index, flag in enumerate(connections.enabled_flags()) if flag]
+    edges = {src_numbers[index] << 32 | dst_numbers[index]: index for index in enabled}
+    if len(edges) != len(enabled):
+        return None, edges
+
+    nodes = [node for layer in layers for node in layer]
+    return (tuple(len(layer) for layer in layers), tuple(node.number for node in nodes),
+            tuple(node.activation for node in nodes), frozenset(edges), tuple(node.number for node in input_nodes),
+            tuple(node.number for node in output_nodes)), edges
+
+
+class PlanCache:
+
+    def __init__(self, size: int = 1000):
+        """
+        Compiled plans by topology signature. Networks with the same topology share one plan's structure, and only
+        supply their own weights.
+        :param size: Maximum number of topologies remembered, the least recently used ones are evicted
+        """
+        self.size = size
+        self.plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def compile(self, network) -> Plan:
+        """
+        Sets the network's plan from the cache, if the network has no plan yet.
+        :param network: Network to compile
+        :return: Evaluation plan
+        """
+        if network.plan is None:
+            network.plan = self.get(network.layers, network.connections, network.input_nodes, network.output_nodes,
+                                    network.prune)
+        return network.plan
+
+    def get(self, layers: List[List[HiddenNode]], connections: InnovationGene, input_nodes: List[HiddenNode],
+            output_nodes: List[HiddenNode], prune: bool = False) -> Plan:
+        """
+        Returns a plan of a network, sharing the structure of the cached plan of the same topology.
+        :param prune: If the plan leaves out the nodes that cannot change an output. A pruned plan folds constant nodes
+                      into its bias, which depends on the weights, so it is compiled without the cache
+        :return: Evaluation plan
+        """
+        if prune:
+            return Plan(layers, connections, input_nodes, output_nodes, prune)
+        key, edges = topology(layers, connections, input_nodes, output_nodes)
+        if key is None:
+            return Plan(layers, connections, input_nodes, output_nodes)
+
+        cached = self.plans.get(key)
+        if cached is None:
+            self.misses += 1
+            template = Plan(layers, connections, input_nodes, output_nodes)
+            numbers = [node.number for node in template.nodes]
+            cached = self.plans[key] = (template,
+                                        [numbers[src] << 32 | numbers[dst] for src, dst in zip(template.src,
+                                                                                               template.dst)],
+                                        [numbers[src] << 32 | numbers[dst] for src, dst in zip(template.recurrent_src,
+                                                                                               template.recurrent_dst)])
+            while len(self.plans) > self.size:
+                self.plans.popitem(last=False)
+        else:
+            self.hits += 1
+            self.plans.move_to_end(key)
+
+        # The structure is shared, the connections are found by their source and destination numbers.
+        template, template_edges, recurrent_edges = cached
+        plan = copy(template)
+        plan.template = template
+        plan.connections = connections
+        plan.indexes = [edges[edge] for edge in template_edges]
+        plan.recurrent_indexes = [edges[edge] for edge in recurrent_edges]
+        plan.update_weights()
+        return plan
+
+
+if __name__ == '__main__':
+    from dna import Dna
+
+    print('Testing Plan')
+    dna_test = Dna(2, 1, 2)
+    plan_test = Plan([dna_test.input_nodes, dna_test.output_nodes], dna_test.innovation_gene,
+                     dna_test.input_nodes, dna_test.output_nodes)
+    print(plan_test.src, plan_test.dst, plan_test.weight, plan_test.ends)
+    print(plan_test.get_output([-1, 0.5]))
+    cache_test = PlanCache()
+    print(cache_test.get([dna_test.input_nodes, dna_test.output_nodes], dna_test.innovation_gene, dna_test.input_nodes,
+                         dna_test.output_nodes).get_output([-1, 0.5]), cache_test.misses)
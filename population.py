@@ -0,0 +1,215 @@
+# population.py
+#
+# Description : Evaluates a whole population of networks in one vectorized sweep.
+# -------------------------------------------------------------------------------
+
+# General imports
+from typing import List, Callable, Union
+
+import numpy as np
+
+# Project imports
+from activations import vectorized
+from batch import activate, plan_layers
+from network import Network
+from plan import Plan, PlanCache
+
+
+class LayerGroup:
+
+    def __init__(self, plans: List[Plan]):
+        """
+        Packs plans with the same number of layers into padded weight tensors. Every layer is padded to its widest
+        version in the group, padded nodes have no connections so they never affect real nodes.
+        :param plans: Plans to pack, all with the same number of layers
+        """
+        self.size = len(plans)
+        widths = np.array([np.diff(plan.layer_ends, prepend=0) for plan in plans], dtype=np.intp)
+        self.widths = widths.max(axis=0)
+        self.offsets = np.concatenate(([0], np.cumsum(self.widths)))
+        self.columns = int(self.offsets[-1])
+
+        # Map every plan position to its padded column, and gather all connections of the group.
+        genomes, src_columns, dst_columns, weights = [], [], [], []
+        self.input_columns = np.zeros((self.size, len(plans[0].input_positions)), dtype=np.intp)
+        self.output_columns = np.zeros((self.size, len(plans[0].output_positions)), dtype=np.intp)
+        self.bias = np.zeros((self.size, self.columns))
+        layer_activations = [[[] for _ in range(len(self.widths))] for _ in plans]
+        for genome, plan in enumerate(plans):
+            layers = np.repeat(np.arange(len(self.widths)), widths[genome])
+            starts = np.asarray(plan.layer_ends) - widths[genome]
+            positions = np.arange(plan.size)
+            columns = self.offsets[layers] + positions - starts[layers]
+
+            self.input_columns[genome] = columns[plan.input_positions]
+            self.output_columns[genome] = columns[plan.output_positions]
+            self.bias[genome, columns] = plan.bias
+            genomes.append(np.full(len(plan.src), genome, dtype=np.intp))
+            src_columns.append(columns[plan.src])
+            dst_columns.append(columns[plan.dst])
+            weights.append(np.asarray(plan.weight, dtype=np.float64))
+            for position in range(plan.size):
+                layer_activations[genome][layers[position]].append(plan.activations[position])
+
+        genomes, weights = np.concatenate(genomes), np.concatenate(weights)
+        src_columns, dst_columns = np.concatenate(src_columns), np.concatenate(dst_columns)
+        dst_layers = np.searchsorted(self.offsets, dst_columns, side='right') - 1
+
+        # One (genomes, earlier columns, layer width) weight tensor per layer.
+        self.matrices = []
+        for layer, (offset, width) in enumerate(zip(self.offsets, self.widths)):
+            matrix = np.zeros((self.size, offset, width))
+            edges = dst_layers == layer
+            np.add.at(matrix, (genomes[edges], src_columns[edges], dst_columns[edges] - offset), weights[edges])
+            self.matrices.append(matrix)
+
+        # Activation masks per layer, a layer with a single activation is activated as a whole.
+        self.activations = []
+        for layer, width in enumerate(self.widths):
+            masks = {}
+            for genome in range(self.size):
+                for offset, activation in enumerate(layer_activations[genome][layer]):
+                    masks.setdefault(activation, np.zeros((self.size, width), dtype=bool))[genome, offset] = True
+            if len(masks) > 1:
+                self.activations.append([(vectorized(activation), mask[:, None, :])
+                                         for activation, mask in masks.items()])
+            else:
+                self.activations.append([(vectorized(activation), None) for activation in masks])
+
+    def get_outputs(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Calculates the output of every network in the group for every row of inputs.
+        :param inputs: Network inputs, shaped (samples, inputs)
+        :return: Network outputs, shaped (networks, samples, outputs)
+        """
+        genomes = np.arange(self.size)[:, None]
+        values = np.repeat(self.bias[:, None, :], inputs.shape[0], axis=1)
+        values[genomes, :, self.input_columns] = inputs.T
+
+        with np.errstate(over='ignore'):
+            for offset, width, matrix, activations in zip(self.offsets, self.widths, self.matrices,
+                                                          self.activations):
+                total = values[:, :, offset:offset + width]
+                if offset:
+                    total = total + values[:, :, :offset] @ matrix
+                for activation, mask in activations:
+                    if mask is None:
+                        values[:, :, offset:offset + width] = activation(total)
+                    else:
+                        values[:, :, offset:offset + width] = np.where(mask, activation(total),
+                                                                       values[:, :, offset:offset + width])
+
+        return values[genomes, :, self.output_columns].transpose(0, 2, 1)
+
+
+class TopologyGroup:
+
+    def __init__(self, plans: List[Plan]):
+        """
+        Packs plans sharing the same structure (see PlanCache) into stacked weight tensors, without padding.
+        :param plans: Plans to pack, all with the same template
+        """
+        self.plan = plans[0]
+        self.size = len(plans)
+        weights = np.array([plan.weight for plan in plans], dtype=np.float64).reshape(self.size, -1)
+
+        # Every layer of the shared structure (see plan_layers), with its (genomes, earlier nodes, layer width) weight
+        # tensor.
+        self.layers = []
+        for start, end, src, dst, edges, groups in plan_layers(self.plan):
+            matrix = np.zeros((self.size, start, end - start))
+            matrix[:, src, dst] = weights[:, edges]
+            self.layers.append((start, end, matrix, groups))
+
+    def get_outputs(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Calculates the output of every network in the group for every row of inputs.
+        :param inputs: Network inputs, shaped (samples, inputs)
+        :return: Network outputs, shaped (networks, samples, outputs)
+        """
+        values = np.zeros((self.size, inputs.shape[0], self.plan.size))
+        values[:, :, self.plan.input_positions] = inputs
+
+        with np.errstate(over='ignore'):
+            for start, end, matrix, groups in self.layers:
+                total = values[:, :, start:end]
+                if start:
+                    total = total + values[:, :, :start] @ matrix
+                activate(values[:, :, start:end], total, groups)
+
+        return values[:, :, self.plan.output_positions]
+
+
+class Population:
+
+    def __init__(self, networks: List[Network], plan_cache: Union[PlanCache, None] = None):
+        """
+        :param networks: Networks to evaluate, at least one, all with the same number of outputs
+        :param plan_cache: Cache compiling the networks, networks sharing a topology are then evaluated together
+        """
+        self.networks = list(networks)
+        if not self.networks:
+            raise ValueError('A population needs at least one network.')
+        self.plan_cache = plan_cache
+
+    def pack(self) -> List[tuple]:
+        """
+        Groups the networks with the same topology, then the other networks by their number of layers, and packs
+        each group. The networks are packed on every evaluation, since mutations may change them between
+        evaluations.
+        :return: List of network indexes and their packed group
+        """
+        if self.plan_cache is not None:
+            plans = [self.plan_cache.compile(network) for network in self.networks]
+        else:
+            plans = [network.compile() for network in self.networks]
+
+        topologies, depths = {}, {}
+        for index, plan in enumerate(plans):
+            if plan.template is not None:
+                topologies.setdefault(id(plan.template), []).append(index)
+            else:
+                depths.setdefault(len(plan.layer_ends), []).append(index)
+
+        groups = []
+        for indexes in topologies.values():
+            if len(indexes) > 1:
+                groups.append((np.array(indexes), TopologyGroup([plans[index] for index in indexes])))
+            else:
+                depths.setdefault(len(plans[indexes[0]].layer_ends), []).append(indexes[0])
+        groups.extend((np.array(indexes), LayerGroup([plans[index] for index in indexes]))
+                      for indexes in depths.values())
+        return groups
+
+    def get_outputs(self, inputs) -> np.ndarray:
+        """
+        Calculates the output of every network for a shared batch of inputs.
+        :param inputs: Network inputs, shaped (samples, inputs)
+        :return: Network outputs, shaped (networks, samples, outputs)
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        outputs = np.zeros((len(self.networks), inputs.shape[0], self.networks[0].outputs))
+        for indexes, group in self.pack():
+            outputs[indexes] = group.get_outputs(inputs)
+        return outputs
+
+    def evaluate(self, inputs, fitness_function: Callable[[np.ndarray], float]) -> List[float]:
+        """
+        Evaluates every network on a shared batch of inputs, and sets each network's fitness.
+        :param inputs: Network inputs, shaped (samples, inputs)
+        :param fitness_function: Function of a network's outputs, shaped (samples, outputs), returning its fitness
+        :return: Fitness of every network
+        """
+        outputs = self.get_outputs(inputs)
+        fitness = [fitness_function(network_outputs) for network_outputs in outputs]
+        for network, network_fitness in zip(self.networks, fitness):
+            network.fitness = network_fitness
+        return fitness
+
+
+if __name__ == '__main__':
+    print('Testing Population')
+    population_test = Population([Network(2, 1, 2) for _ in range(3)])
+    test_inputs = np.array([[0, 0], [0, 1], [1, 0], [1, 1]])
+    print(population_test.get_outputs(test_inputs))
+    print(population_test.evaluate(test_inputs, lambda outputs: -np.abs(outputs[:, 0] - [0, 1, 1, 0]).sum()))
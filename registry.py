@@ -0,0 +1,109 @@
+# registry.py
+#
+# Description : Innovation registry, gives identical structural mutations identical numbers.
+# ------------------------------------------------------------------------------------------
+
+# General imports
+from collections import OrderedDict
+from typing import Container, Dict, Tuple
+
+
+class InnovationRegistry:
+
+    def __init__(self, innovation_number: int, node_number: int, memory_size: int = 0):
+        """
+        :param innovation_number: Next free innovation number
+        :param node_number: Next free node number
+        :param memory_size: Number of structures remembered from earlier generations, 0 remembers only the current
+                            generation (as in the NEAT paper)
+        """
+        self.innovation_number = innovation_number
+        self.node_number = node_number
+        self.memory_size = memory_size
+
+        # Structures of the current generation: (src, dst) -> innovation number,
+        # and split innovation number -> (node number, source innovation number, destination innovation number).
+        self.connections: Dict[Tuple[int, int], int] = {}
+        self.splits: Dict[int, Tuple[int, int, int]] = {}
+
+        # Structures of earlier generations, least recently used first.
+        self.memory = OrderedDict()
+
+    def connection(self, src_number: int, dst_number: int) -> int:
+        """
+        Returns the innovation number of a connection, the same one for every connection between the same nodes.
+        :param src_number: Source node's number
+        :param dst_number: Destination node's number
+        :return: Innovation number
+        """
+        avenue = src_number, dst_number
+        number = self.connections.get(avenue)
+        if number is None:
+            number = self.recall(('connection', avenue))
+            if number is None:
+                number = self.innovation_number
+                self.innovation_number += 1
+            self.connections[avenue] = number
+        return number
+
+    def split(self, innovation_number: int, src_number: int, dst_number: int,
+              taken: Container[int] = ()) -> Tuple[int, int, int]:
+        """
+        Returns the numbers of a node splitting an innovation, the same ones for every split of the same innovation.
+        A genome that already split the innovation (and so already has the node) gets new numbers.
+        :param innovation_number: Number of the innovation being split
+        :param src_number: Innovation's source node number
+        :param dst_number: Innovation's destination node number
+        :param taken: Node numbers already in the genome
+        :return: Node number, source innovation number, destination innovation number
+        """
+        numbers = self.splits.get(innovation_number)
+        if numbers is None:
+            numbers = self.recall(('split', innovation_number))
+            if numbers is not None:
+                self.splits[innovation_number] = numbers
+
+        if numbers is None or numbers[0] in taken:
+            numbers = self.node_number, self.innovation_number, self.innovation_number + 1
+            self.node_number += 1
+            self.innovation_number += 2
+            self.splits.setdefault(innovation_number, numbers)
+
+            # The new connections are registered, so later connection mutations between the same nodes match them.
+            self.connections.setdefault((src_number, numbers[0]), numbers[1])
+            self.connections.setdefault((numbers[0], dst_number), numbers[2])
+        return numbers
+
+    def recall(self, key: tuple):
+        """
+        Looks up a structure of an earlier generation.
+        :param key: Structure key
+        :return: Structure numbers, or None if it is not remembered
+        """
+        numbers = self.memory.get(key)
+        if numbers is not None:
+            self.memory.move_to_end(key)
+        return numbers
+
+    def next_generation(self) -> None:
+        """
+        Starts a new generation, moving this generation's structures to memory and evicting the oldest ones.
+        :return: None
+        """
+        if self.memory_size:
+            self.memory.update((('connection', avenue), number) for avenue, number in self.connections.items())
+            self.memory.update((('split', number), numbers) for number, numbers in self.splits.items())
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+        self.connections.clear()
+        self.splits.clear()
+
+
+if __name__ == '__main__':
+    print('Testing InnovationRegistry')
+    registry_test = InnovationRegistry(6, 5, memory_size=10)
+    print(registry_test.connection(0, 4), registry_test.connection(0, 4), registry_test.connection(1, 4))
+    print(registry_test.split(0, 0, 3), registry_test.split(0, 0, 3), registry_test.split(0, 0, 3, taken={5}))
+    registry_test.next_generation()
+    print(registry_test.connection(0, 4), registry_test.memory)
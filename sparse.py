@@ -0,0 +1,95 @@
+# sparse.py
+#
+# Description : Vectorized evaluation of a compiled plan with sparse per-layer adjacency, for large sparse networks.
+# ----------------------------------------------------------------------------------------------------------------
+
+# General imports
+import numpy as np
+
+# Project imports
+from batch import BatchPlan, CsrEdges, activate
+from plan import Plan
+
+# Constants
+# A plan is evaluated sparsely when it has at least this many nodes, and its connections fill at most this fraction
+# of the dense per-layer matrices. Below that, the dense matrices are small enough to be as fast or faster.
+SPARSE_MIN_SIZE = 1024
+SPARSE_DENSITY = 0.01
+
+
+def density(plan: Plan) -> float:
+    """
+    Returns the fraction of the dense per-layer matrices (see BatchPlan) filled by the plan's connections.
+    :param plan: Compiled plan
+    :return: Density
+    """
+    cells, start = 0, 0
+    for end in plan.layer_ends:
+        cells += start * (end - start)
+        start = end
+    return len(plan.src) / cells if cells else 1.0
+
+
+def use_sparse(plan: Plan) -> bool:
+    """
+    Chooses the evaluation backend of a plan.
+    :param plan: Compiled plan
+    :return: If the plan should be evaluated by a SparsePlan rather than a BatchPlan
+    """
+    return plan.size >= SPARSE_MIN_SIZE and density(plan) <= SPARSE_DENSITY
+
+
+class SparsePlan(BatchPlan):
+
+    def __init__(self, plan: Plan):
+        """
+        Same as BatchPlan, but every layer's connections are kept as a sparse adjacency instead of a dense matrix, so
+        memory and time grow with the number of connections rather than the number of node pairs.
+        :param plan: Compiled plan
+        """
+        self.adjacencies = None
+        super(SparsePlan, self).__init__(plan)
+
+    def load_weights(self) -> None:
+        """
+        Loads the plan's weights into every layer's adjacency, building the adjacencies on the first load.
+        :return: None
+        """
+        if self.adjacencies is None:
+            self.adjacencies = [CsrEdges(src, dst, edges) if len(edges) else None
+                                for _, _, src, dst, edges, _ in self.layers]
+
+        self.weight = self.plan.weight
+        weight = np.array(self.weight, dtype=np.float64)
+        for adjacency in self.adjacencies:
+            if adjacency is not None:
+                adjacency.load_weights(weight)
+        if self.recurrent is not None:
+            self.recurrent.load_weights(np.array(self.plan.recurrent_weight, dtype=np.float64))
+
+    def propagate(self, values: np.ndarray) -> None:
+        """
+        Activates every layer after summing its sparse inputs, in place.
+        :param values: Summed inputs of every node shaped (samples, nodes), replaced by the node outputs
+        :return: None
+        """
+        if self.weight is not self.plan.weight:
+            self.load_weights()
+
+        with np.errstate(over='ignore'):
+            for (start, end, _, _, _, groups), adjacency in zip(self.layers, self.adjacencies):
+                layer_values = values[:, start:end]
+                if adjacency is not None:
+                    layer_values[:, adjacency.rows] += adjacency.product(values)
+                activate(layer_values, layer_values, groups)
+
+
+if __name__ == '__main__':
+    from network import Network
+
+    print('Testing SparsePlan')
+    network_test = Network(2, 1, 2)
+    sparse_test = SparsePlan(network_test.compile())
+    test_inputs = np.array([[-1, 0.5], [0, 0], [1, 1]])
+    print(density(network_test.plan), sparse_test.get_outputs(test_inputs))
+    print([network_test.get_output(row) for row in test_inputs.tolist()])
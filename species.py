@@ -0,0 +1,219 @@
+# species.py
+#
+# Description : Compatibility distance and speciation of networks.
+# ----------------------------------------------------------------
+
+# General imports
+from random import choice
+from typing import Dict, List, Tuple
+
+# Project imports
+from dna import Dna
+from network import Network
+
+# Constants
+EXCESS_COEFFICIENT = 1.0
+DISJOINT_COEFFICIENT = 1.0
+WEIGHT_COEFFICIENT = 0.4
+SMALL_GENOME = 20
+
+
+def sorted_genes(dna: Dna) -> Tuple[List[int], List[float]]:
+    """
+    Returns the innovation numbers of a dna in ascending order, and their weights.
+    :param dna: Dna to sort
+    :return: Innovation numbers, weights
+    """
+    numbers, weights = dna.innovation_gene.numbers, dna.innovation_gene.weights
+    order = sorted(range(len(numbers)), key=numbers.__getitem__)
+    return [numbers[index] for index in order], [weights[index] for index in order]
+
+
+def genes_distance(a_genes: Tuple[List[int], List[float]], b_genes: Tuple[List[int], List[float]],
+                   excess_coefficient: float = EXCESS_COEFFICIENT, disjoint_coefficient: float = DISJOINT_COEFFICIENT,
+                   weight_coefficient: float = WEIGHT_COEFFICIENT) -> float:
+    """
+    Calculates the compatibility distance of two sorted genes (see sorted_genes), merging them in linear time.
+    :return: Compatibility distance
+    """
+    (a_numbers, a_weights), (b_numbers, b_weights) = a_genes, b_genes
+    a_length, b_length = len(a_numbers), len(b_numbers)
+    a_index = b_index = matching = disjoint = 0
+    weight_difference = 0.0
+
+    # Merge both genes until one of them ends, every unmatched gene on the way is disjoint.
+    while a_index < a_length and b_index < b_length:
+        a_number, b_number = a_numbers[a_index], b_numbers[b_index]
+        if a_number == b_number:
+            weight_difference += abs(a_weights[a_index] - b_weights[b_index])
+            matching += 1
+            a_index += 1
+            b_index += 1
+        elif a_number < b_number:
+            disjoint += 1
+            a_index += 1
+        else:
+            disjoint += 1
+            b_index += 1
+
+    # Genes past the end of the other gene are excess.
+    excess = a_length - a_index + b_length - b_index
+
+    # Small genomes are not normalized by their size.
+    size = max(a_length, b_length)
+    size = size if size >= SMALL_GENOME else 1
+    return (excess_coefficient * excess + disjoint_coefficient * disjoint) / size + \
+        weight_coefficient * (weight_difference / matching if matching else 0.0)
+
+
+def distance(a: Dna, b: Dna, excess_coefficient: float = EXCESS_COEFFICIENT,
+             disjoint_coefficient: float = DISJOINT_COEFFICIENT, weight_coefficient: float = WEIGHT_COEFFICIENT) -> float:
+    """
+    Calculates the compatibility distance of two dna, based on their excess and disjoint genes and the average weight
+    difference of their matching genes.
+    :return: Compatibility distance
+    """
+    return genes_distance(sorted_genes(a), sorted_genes(b), excess_coefficient, disjoint_coefficient,
+                          weight_coefficient)
+
+
+def distance_matrix(dnas: List[Dna], excess_coefficient: float = EXCESS_COEFFICIENT,
+                    disjoint_coefficient: float = DISJOINT_COEFFICIENT, weight_coefficient: float = WEIGHT_COEFFICIENT,
+                    block_size: int = 64):
+    """
+    Calculates the compatibility distance of every pair of dna at once. Requires numpy.
+    :param dnas: Dna to compare
+    :param block_size: Number of rows calculated at a time, bounds the memory used
+    :return: Distance matrix, as a numpy array shaped (dnas, dnas)
+    """
+    import numpy as np
+
+    # Lay out all genes on the union of innovation numbers.
+    genes = [sorted_genes(dna) for dna in dnas]
+    union = np.unique(np.concatenate([np.asarray(numbers, dtype=np.int64) for numbers, _ in genes] + [[]]))
+    present = np.zeros((len(dnas), len(union)), dtype=bool)
+    weights = np.zeros((len(dnas), len(union)))
+    for index, (numbers, dna_weights) in enumerate(genes):
+        columns = np.searchsorted(union, numbers)
+        present[index, columns] = True
+        weights[index, columns] = dna_weights
+
+    # Genes of a dna with an innovation number above the other's highest number are excess.
+    lengths = present.sum(axis=1)
+    counts = np.cumsum(present, axis=1)
+    last_columns = np.array([np.searchsorted(union, numbers[-1]) if numbers else -1 for numbers, _ in genes])
+    below = np.where(last_columns[None, :] >= 0, counts[:, np.maximum(last_columns, 0)], 0)
+    excess = (lengths[:, None] - below) + (lengths[None, :] - below.T)
+
+    matching = present.astype(np.float64) @ present.T.astype(np.float64)
+    disjoint = lengths[:, None] + lengths[None, :] - 2 * matching - excess
+
+    weight_difference = np.zeros((len(dnas), len(dnas)))
+    for start in range(0, len(dnas), block_size):
+        both = present[start:start + block_size, None, :] & present[None, :, :]
+        difference = np.abs(weights[start:start + block_size, None, :] - weights[None, :, :])
+        weight_difference[start:start + block_size] = (difference * both).sum(axis=2)
+
+    size = np.maximum(lengths[:, None], lengths[None, :])
+    size = np.where(size >= SMALL_GENOME, size, 1)
+    average_difference = np.divide(weight_difference, matching, out=np.zeros_like(weight_difference),
+                                   where=matching > 0)
+    return (excess_coefficient * excess + disjoint_coefficient * disjoint) / size + \
+        weight_coefficient * average_difference
+
+
+class Species:
+
+    def __init__(self, number: int, representative: Dna):
+        self.number = number
+        self.representative = representative
+        self.members = []
+
+    def __str__(self) -> str:
+        return "Species {}: {} members".format(self.number, len(self.members))
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class Speciation:
+
+    def __init__(self, threshold: float, excess_coefficient: float = EXCESS_COEFFICIENT,
+                 disjoint_coefficient: float = DISJOINT_COEFFICIENT, weight_coefficient: float = WEIGHT_COEFFICIENT):
+        self.threshold = threshold
+        self.excess_coefficient = excess_coefficient
+        self.disjoint_coefficient = disjoint_coefficient
+        self.weight_coefficient = weight_coefficient
+        self.species = []
+        self.species_number = 0
+
+        # Per generation caches, of sorted genes per dna and distances per dna pair. The dna itself is kept with its
+        # genes, so its id can not be reused by another dna during the generation.
+        self.genes: Dict[int, tuple] = {}
+        self.distances: Dict[Tuple[int, int], float] = {}
+
+    def get_genes(self, dna: Dna) -> Tuple[List[int], List[float]]:
+        """
+        Returns the cached sorted genes of a dna.
+        :param dna: Dna to get genes of
+        :return: Innovation numbers, weights
+        """
+        cached = self.genes.get(id(dna))
+        if cached is None:
+            cached = self.genes[id(dna)] = dna, sorted_genes(dna)
+        return cached[1]
+
+    def distance(self, a: Dna, b: Dna) -> float:
+        """
+        Returns the cached compatibility distance of two dna.
+        :return: Compatibility distance
+        """
+        key = (id(a), id(b)) if id(a) < id(b) else (id(b), id(a))
+        cached = self.distances.get(key)
+        if cached is None:
+            cached = self.distances[key] = genes_distance(self.get_genes(a), self.get_genes(b),
+                                                          self.excess_coefficient, self.disjoint_coefficient,
+                                                          self.weight_coefficient)
+        return cached
+
+    def speciate(self, networks: List[Network]) -> List[Species]:
+        """
+        Assigns every network to the first species whose representative is within the threshold distance, or to a new
+        species it represents. Species left without members are removed.
+        :param networks: Networks to speciate
+        :return: All species
+        """
+        for network in networks:
+            for species in self.species:
+                if self.distance(network.dna, species.representative) < self.threshold:
+                    species.members.append(network)
+                    break
+            else:
+                species = Species(self.species_number, network.dna)
+                species.members.append(network)
+                self.species.append(species)
+                self.species_number += 1
+
+        self.species = [species for species in self.species if species.members]
+        return self.species
+
+    def next_generation(self) -> None:
+        """
+        Starts a new generation. Each species is represented by a random member of the last generation, and the
+        caches are cleared.
+        :return: None
+        """
+        for species in self.species:
+            species.representative = choice(species.members).dna
+            species.members = []
+        self.genes.clear()
+        self.distances.clear()
+
+
+if __name__ == '__main__':
+    print('Testing Speciation')
+    networks_test = [Network(2, 1, 2) for _ in range(6)]
+    print(distance(networks_test[0].dna, networks_test[1].dna))
+    print(distance_matrix([network.dna for network in networks_test]))
+    speciation_test = Speciation(0.5)
+    print(speciation_test.speciate(networks_test))